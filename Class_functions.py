@@ -1,13 +1,128 @@
 """ -----     IMPORTS     -------------------------------------------------------------------------------------------"""
+import atexit
 import configparser
+import copy
+import csv
+import hashlib
+import inspect
+import itertools
+import json
 import os
+import re
+import select
+import sqlite3
+import tempfile
 import time
 import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
 import librosa
 import noisereduce as nr
 import numpy as np
 import soundfile as sf
-from scipy.signal import butter, sosfilt
+from scipy.ndimage import convolve1d
+from scipy.signal import butter, istft, lfilter, lfilter_zi, sosfilt, stft
+
+
+""" -----     PROGRESS     ------------------------------------------------------------------------------------------"""
+
+
+class OperationCancelled(Exception):
+    pass
+
+
+# Shared between the caller and a running operation, the operation stops before its next file once cancelled
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+        return None
+
+    def is_cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise OperationCancelled("Operation cancelled")
+        return None
+
+
+# Progress of a long operation: the callback receives a dict with the current stage, the files done / total, the
+# bytes processed, the current file and the throughput. The cancellation token is checked at each step
+class Progress:
+    def __init__(self, callback=None, cancel_token: 'CancelToken' = None):
+        self.callback = callback
+        self.cancel_token = cancel_token
+        self.stage, self.done, self.total, self.bytes = "", 0, 0, 0
+        self.start_time = time.perf_counter()
+
+    def start(self, stage, total):
+        self.check()
+        self.stage, self.done, self.total = stage, 0, total
+        self.emit()
+        return None
+
+    # One more file processed, its size is used when the number of bytes is not given
+    def advance(self, file_path=None, num_bytes=None):
+        self.done += 1
+        if num_bytes is None and file_path is not None and os.path.exists(file_path):
+            num_bytes = os.path.getsize(file_path)
+        self.bytes += num_bytes or 0
+        self.emit(file_path)
+        self.check()
+        return None
+
+    def emit(self, file_path=None):
+        if self.callback is not None:
+            elapsed = time.perf_counter() - self.start_time
+            self.callback({"stage": self.stage, "done": self.done, "total": self.total, "bytes": self.bytes,
+                           "file": file_path, "elapsed": elapsed,
+                           "bytes_per_second": self.bytes / elapsed if elapsed > 0 else 0.0})
+        return None
+
+    def check(self):
+        if self.cancel_token is not None:
+            self.cancel_token.check()
+        return None
+
+
+# Files of a pool job, with the result of each one when the job future is given (jobs run on a file or on a tuple of
+# files, see enhance_voice_lines). The exception of a failed job is raised
+def job_results(file_path, future=None):
+    file_paths = file_path if isinstance(file_path, tuple) else (file_path,)
+    if future is None:
+        return list(file_paths)
+    results = future.result() if isinstance(file_path, tuple) else [future.result()]
+    return list(zip(file_paths, results))
+
+
+# Wait for pool jobs ({future: file path}) while reporting their progress, the progress is refreshed at least every
+# interval seconds so the caller can keep its UI alive. on_done(future, file path) is called as soon as a job ends.
+# The pending jobs are cancelled with the operation
+def wait_jobs(futures, progress: 'Progress', stage, interval=0.1, on_done=None):
+    pending = set(futures)
+    try:
+        progress.start(stage, sum(len(f) if isinstance(f, tuple) else 1 for f in futures.values()))
+        while pending:
+            done, pending = wait(pending, timeout=interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                if on_done is not None:
+                    on_done(future, futures[future])
+                for file_path in job_results(futures[future]):
+                    progress.advance(file_path)
+            if not done:
+                progress.emit()
+                progress.check()
+    except OperationCancelled:
+        for future in pending:
+            future.cancel()
+        raise
+    return None
 
 
 """ -----     GENERIC FUNCTIONS     ---------------------------------------------------------------------------------"""
@@ -29,10 +144,9 @@ def set_debug_status(log: 'Logs'):
 def get_subtitles(subtitle_path, separator):
     sub_dict = {}
     try:
-        with open(subtitle_path, "r", encoding="utf-8") as f:
-            for line in f:
-                # Split the line by commas
-                parts = line.strip().split(separator)
+        with open(subtitle_path, "r", encoding="utf-8", newline="") as f:
+            # Split the line by commas (quoted values can contain commas)
+            for parts in csv.reader(f, delimiter=separator):
                 # The first part is the key, the rest are the values
                 if len(parts) != 0:
                     key = parts[0]
@@ -43,6 +157,126 @@ def get_subtitles(subtitle_path, separator):
     return sub_dict
 
 
+# Metadata of a raw float32 workspace file, these files have no header so the sample rate comes from the config
+class RawAudioInfo:
+    def __init__(self, file_path, sample_rate):
+        self.name = file_path
+        self.samplerate = sample_rate
+        self.channels = 1
+        self.frames = os.path.getsize(file_path) // np.dtype(np.float32).itemsize
+        self.duration = self.frames / sample_rate
+        self.format = "RAW"
+        self.subtype = "FLOAT"
+
+
+# Read the audio metadata (duration, sample rate, channels...) without decoding the samples
+def get_audio_info(file_path, l_log: 'Logs' = None, sample_rate=44100):
+    try:
+        if file_path.endswith(".raw"):
+            return RawAudioInfo(file_path, sample_rate)
+        return sf.info(file_path)
+    except Exception as e:
+        if l_log is not None:
+            l_log.write_log(f"WARN: Can't read audio info of '{file_path}': {e}")
+        return None
+
+
+# Read an audio file as mono float32 at the given sample rate, raw workspace files can be memory-mapped
+def read_audio(file_path, sample_rate, mmap=False):
+    if file_path.endswith(".raw"):
+        if mmap:
+            return np.memmap(file_path, dtype=np.float32, mode='r')
+        return np.fromfile(file_path, dtype=np.float32)
+    audio, sr = librosa.load(file_path, sr=sample_rate)
+    return audio
+
+
+# Write an audio file, the format is chosen from the extension (wav files are written in float32)
+def write_audio(file_path, audio, sample_rate, settings=None):
+    os.replace(write_audio_temp(file_path, audio, sample_rate, settings=settings), file_path)
+    return file_path
+
+
+# Write the audio to a temporary file next to file_path and return its path, it is renamed over file_path once complete
+# so a crash never leaves a truncated voice line. The temporary name doesn't end with the audio extension, it is never
+# listed as a voice line. settings are the encoder settings of the compressed formats (see get_encoder_settings)
+def write_audio_temp(file_path, audio, sample_rate, settings=None):
+    extension = os.path.splitext(file_path)[1]
+    temp_path = file_path + ".partial"
+    try:
+        if extension == ".raw":
+            np.asarray(audio, dtype=np.float32).tofile(temp_path)
+        elif extension == ".wav":
+            sf.write(temp_path, audio, sample_rate, format="wav", subtype="FLOAT")
+        else:
+            sf.write(temp_path, audio, sample_rate, format=extension[1:], **(settings or {}))
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return temp_path
+
+
+# Encoder settings of the output profiles for the compressed formats: soundfile compression level (Vorbis quality is
+# 1 - level, 0.6 is the libsndfile default). The Vorbis encoding time barely depends on it, the encoding time is saved
+# by keeping the workspace voice lines in PCM (workspace_format, see Configuration.get_workspace_format)
+ENCODER_PROFILES = {"draft": {"compression_level": 1.0}, "review": {"compression_level": 0.6},
+                    "final": {"compression_level": 0.2}}
+
+
+# soundfile only accepts the compression level since 0.13, older versions write with the libsndfile defaults
+SOUNDFILE_COMPRESSION = "compression_level" in inspect.signature(sf.write).parameters
+
+
+# Encoder settings of the workspace voice lines, or of the voice lines pushed in the game files
+def get_encoder_settings(l_config: 'Configuration', push=False):
+    if not SOUNDFILE_COMPRESSION:
+        return {}
+    profile = l_config.config["Advanced Settings"].get("push_profile" if push else "encoder_profile", "review")
+    return ENCODER_PROFILES.get(profile, ENCODER_PROFILES["review"])
+
+
+# Encode a workspace voice line to the game format with the push profile, files already in the game format are just
+# copied (they are not encoded again)
+def export_voice_line(source, destination, l_config: 'Configuration'):
+    if os.path.splitext(source)[1] == os.path.splitext(destination)[1]:
+        shutil.copy(source, destination)
+    else:
+        sample_rate = l_config.config["Static settings"]["sample_rate"]
+        write_audio(destination, read_audio(source, sample_rate, mmap=True), sample_rate,
+                    settings=get_encoder_settings(l_config, push=True))
+    return destination
+
+
+# Export a list of (source, destination) voice lines in parallel, return the number of exported files
+def export_voice_lines(file_pairs, l_log: 'Logs', l_config: 'Configuration', workers=None):
+    exported = 0
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = {executor.submit(export_voice_line, source, destination, l_config): source
+                   for source, destination in file_pairs}
+    for future, source in futures.items():
+        if future.exception() is not None:
+            l_log.write_log(f"WARN: Can't export '{source}' to the game files: {future.exception()}")
+        else:
+            exported += 1
+    return exported
+
+
+# Read a json file, return the default value if it doesn't exist or can't be read
+def load_json(file_path, default=None):
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json(file_path, data):
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    return file_path
+
+
 # Delete directory and re-create it
 def clear_directory(directory):
     try:
@@ -53,43 +287,281 @@ def clear_directory(directory):
         return e
 
 
-def adjust_volume(log: 'Logs', l_config: 'Configuration'):
-    adjusted_number, scaling, wierd_files = 0, [], 0
+# Get (and create) the cache folder of the workspace, or the one of the current character
+def get_cache_folder(l_config: 'Configuration', character=False):
+    cache_folder = l_config.config["Settings"]["workspace_folder"] + l_config.config["Static settings"]["cache_folder"]
+    if character:
+        cache_folder += "/" + l_config.config["Settings"]["character_voice_folder"]
+    os.makedirs(cache_folder, exist_ok=True)
+    return cache_folder
+
+
+# Hardlink a file to a new name, or copy it if the file system doesn't support links
+def clone_file(source, destination):
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+    return destination
+
+
+# Get the 10ms silent track used for every blank track, it is encoded once per sample rate and format
+def get_blank_template(l_config: 'Configuration'):
+    sample_rate = l_config.config["Static settings"]["sample_rate"]
+    audio_format = l_config.config["Static settings"]["audio_format"]
+    template_path = f"{get_cache_folder(l_config)}/blank_{sample_rate}.{audio_format}"
+    if not os.path.exists(template_path):
+        temp_path = f"{template_path}.{os.getpid()}.tmp"
+        sf.write(temp_path, np.zeros(int(0.01 * sample_rate)), sample_rate, format=audio_format)
+        os.replace(temp_path, template_path)
+    return template_path
+
+
+# Make the blank tracks folder contain exactly one blank track per name, only the differences are written
+def sync_blank_tracks(folder_path, names, l_log: 'Logs', l_config: 'Configuration', workers=8):
+    extension = "." + l_config.config["Static settings"]["audio_format"]
+    template_path = get_blank_template(l_config)
+    template_size = os.path.getsize(template_path)
+    os.makedirs(folder_path, exist_ok=True)
+    folder = FileManagement(folder_path, logs=l_log, config=l_config)
+    existing = folder.get_folder_content(raw=True, file_filter=extension) or {}
+    wanted = {name + extension for name in names}
+    removed, failed = 0, 0
+    # Remove the tracks that are not selected anymore
+    for file_name in existing:
+        if file_name not in wanted:
+            try:
+                os.remove(os.path.join(folder_path, file_name))
+                removed += 1
+            except Exception as e:
+                l_log.write_log(f"WARN: Can't remove blank track '{file_name}': {e}")
+    # Keep the tracks that are already a copy of the template
+    to_create, unchanged = [], 0
+    for file_name in wanted:
+        file_path = os.path.join(folder_path, file_name)
+        if file_name in existing:
+            if os.path.getsize(file_path) == template_size:
+                unchanged += 1
+                continue
+            try:
+                os.remove(file_path)
+            except Exception as e:
+                l_log.write_log(f"WARN: Can't replace blank track '{file_name}': {e}")
+                failed += 1
+                continue
+        to_create.append(file_path)
+    # Clone the template to the new names
+    added = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(clone_file, template_path, file_path): file_path for file_path in to_create}
+    for future, file_path in futures.items():
+        if future.exception() is not None:
+            l_log.write_log(f"WARN: Can't create blank track '{file_path}': {future.exception()}")
+            failed += 1
+        else:
+            added += 1
+    l_log.write_log(f"INFO: Blank tracks synced: {added} added, {removed} removed, "
+                    f"{unchanged} unchanged, {failed} failed")
+    return added, removed, failed
+
+
+# Signature of a file, a measure stored for the file is reused while the signature is unchanged
+def get_file_signature(file_path):
+    stat = os.stat(file_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+# Level of an audio file for the volume adjustment: its mean RMS (of the loud segments only if accurate), or its
+# loudness blocks (the loudness of a group is gated over the blocks of all its files)
+def measure_volume(file_path, lufs, accurate, l_log: 'Logs', l_config: 'Configuration'):
+    if lufs:
+        return measure_loudness(file_path, l_config.config["Static settings"]["sample_rate"])
+    audio = Audio(path=file_path, logs=l_log, config=l_config)
+    rms = audio.calculate_rms(isolate=accurate)
+    audio.release()
+    return float(rms)
+
+
+# Linear gain bringing the level of a line to the reference level, None if one of them can't be measured
+def volume_gain(reference, level, lufs):
+    if reference is None or level is None or not np.isfinite(reference) or not np.isfinite(level):
+        return None
+    if lufs:
+        return 10 ** ((reference - level) / 20)
+    return reference / level if level > 0 else None
+
+
+def get_gain_plan_path(l_config: 'Configuration', suffix=""):
+    return get_cache_folder(l_config, character=True) + f"/gain_plan{suffix}.json"
+
+
+# Measure the voice lines ({group: [file names]}) and their original groups with the worker pool and compute the
+# gain of each line. The plan is saved in the character cache with the measures and the signature of their files: a
+# measure is reused while its files are unchanged, so the plan can be reviewed and the step run again without
+# analysing the files again. Lines whose gain is within volume_gain_tolerance (dB) are skipped.
+# Return the plan and the names of the lines planned by this call
+def plan_volume(vl_files, l_log: 'Logs', l_config: 'Configuration', pool: 'WorkerPool', progress: 'Progress' = None,
+                suffix=""):
+    progress = progress or Progress()
     vo_folder = l_config.config["Settings"]["voice_folder"] + "/" + l_config.config["Settings"][
         "character_voice_folder"]
+    work_folder = (l_config.config["Settings"]["workspace_folder"] + "/" +
+                   l_config.config["Settings"]["character_voice_folder"] +
+                   l_config.config["Static settings"]["voice_lines"])
     extension = "." + l_config.config["Static settings"]["audio_format"]
+    accurate = bool(l_config.config["Advanced Settings"]["accurate_volume_adjustment"])
+    lufs = l_config.config["Advanced Settings"].get("volume_adjustment_mode", "rms") == "lufs"
+    multiplier = l_config.config["Settings"]["volume_multiplier"]
+    tolerance = l_config.config["Advanced Settings"]["volume_gain_tolerance"]
+    plan_path = get_gain_plan_path(l_config, suffix=suffix)
+    # The measures only depend on the mode, the gains are computed again on each call
+    parameters = {"mode": "lufs" if lufs else "rms", "accurate": accurate}
+    plan = load_json(plan_path, default=None)
+    if not isinstance(plan, dict) or plan.get("parameters") != parameters:
+        plan = {"parameters": parameters, "groups": {}, "lines": {}}
+    o_files = FileManagement(path=vo_folder, logs=l_log, config=l_config).get_folder_content(file_filter=extension,
+                                                                                          raw=False)
+    # Files to measure: {path: (group, None) for an original line, (group, name) for a voice line}
+    jobs, groups = {}, []
+    for group in vl_files:
+        if group not in o_files:
+            l_log.write_log(f"WARN: {group} does not exist in the original voice folder, you may check your folders")
+            continue
+        groups.append(group)
+        o_paths = [vo_folder + "/" + o_file for o_file in o_files[group]]
+        signature = [[os.path.basename(path)] + get_file_signature(path) for path in o_paths]
+        # The failed or cancelled measures are saved without a value, they are measured again
+        stored = plan["groups"].get(group, {})
+        if stored.get("signature") != signature or stored.get("reference") is None:
+            plan["groups"][group] = {"signature": signature, "reference": None}
+            jobs.update({path: (group, None) for path in o_paths})
+        for name in vl_files[group]:
+            signature = get_file_signature(work_folder + "/" + name)
+            line = plan["lines"].get(name)
+            if line is None or line["signature"] != signature or line["group"] != group or line["level"] is None:
+                plan["lines"][name] = {"group": group, "signature": signature, "level": None}
+                jobs[work_folder + "/" + name] = (group, name)
+    l_log.write_log(f"INFO: Volume analysis, {len(jobs)} files to measure")
+    references = {}
+
+    def measured(future, file_path):
+        group, name = jobs[file_path]
+        try:
+            value = future.result()
+        except Exception as e:
+            l_log.write_log(f"WARN: Can't measure the volume of {file_path}: {e}")
+            return None
+        if name is None:
+            references.setdefault(group, []).append(value)
+        else:
+            plan["lines"][name]["level"] = float(integrated_loudness(value)) if lufs else value
+
+    try:
+        futures = pool.map_files(measure_volume, list(jobs), lufs, accurate, l_config=l_config)
+        wait_jobs(futures, progress, "analyse volume", on_done=measured)
+        # A reference is only kept if all the original lines of its group were measured
+        for group, values in references.items():
+            if len(values) == len(o_files[group]):
+                plan["groups"][group]["reference"] = (float(integrated_loudness(np.concatenate(values))) if lufs
+                                                      else float(np.mean(values)))
+        planned = []
+        for group in groups:
+            for name in vl_files[group]:
+                line = plan["lines"][name]
+                gain = volume_gain(plan["groups"][group]["reference"], line["level"], lufs)
+                # The lines that couldn't be measured are left out of the plan, they are not adjusted
+                if gain is None:
+                    l_log.write_log(f"WARN: Can't measure the volume of {name} or of its original lines, volume not "
+                                    f"adjusted")
+                    continue
+                gain_db = 20 * np.log10(gain * multiplier) if gain * multiplier > 0 else -np.inf
+                line.update({"gain": gain * multiplier, "gain_db": round(gain_db, 2),
+                             "skip": bool(abs(gain_db) <= tolerance)})
+                planned.append(name)
+    finally:
+        # The measures already done are kept even if the analysis is cancelled
+        save_json(plan_path, plan)
+    return plan, planned
+
+
+# Apply a gain to a voice line, the line is written next to the original, return the path of the written file
+def apply_volume_gain(file_path, gain, l_log: 'Logs', l_config: 'Configuration'):
+    voice_line = Audio(path=file_path, logs=l_log, config=l_config)
+    voice_line.audio *= gain
+    temp_path = write_audio_temp(voice_line.path, voice_line.audio, voice_line.sr,
+                                 settings=get_encoder_settings(l_config))
+    voice_line.release()
+    return temp_path
+
+
+# Adjust the volume of the voice lines to the original ones, only the given files if file_paths is set
+# The lines are measured first (see plan_volume), the gains of the plan are then applied by the worker pool. Only the
+# lines with a gain are rewritten. Return the number of adjusted lines
+# The runs that can overlap a run on the whole character (the watch mode) use their own journal and plan (suffix), the
+# end of one run would delete the journal of the other and their plans would overwrite each other
+def adjust_volume(l_log: 'Logs', l_config: 'Configuration', progress: 'Progress' = None, file_paths=None,
+                  pool: 'WorkerPool' = None, suffix=""):
+    progress = progress or Progress()
+    pool = pool or get_worker_pool(l_config)
+    adjusted_number = 0
+    work_extension = "." + l_config.get_workspace_format()
     work_folder = (l_config.config["Settings"]["workspace_folder"] + "/" +
                    l_config.config["Settings"]["character_voice_folder"] +
                    l_config.config["Static settings"]["voice_lines"])
-    accurate = False
-    if l_config.config["Advanced Settings"]["accurate_volume_adjustment"]:
-        accurate = True
-    o_folder = FileManagement(path=vo_folder, logs=log, config=l_config)
-    o_files = o_folder.get_folder_content(file_filter=extension, raw=False)
-    vl_folder = FileManagement(path=work_folder, logs=log, config=l_config)
-    vl_files = vl_folder.get_folder_content(file_filter=extension, raw=False)
-    o_rms, o_rms_value, vl_rms_value = [], 0, 0
-    for vl_file_base in vl_files:
-        if vl_file_base in o_files:
-            # get original rms
-            for o_file in o_files[vl_file_base]:
-                audio = Audio(path=vo_folder + "/" + o_file, logs=log, config=l_config)
-                o_rms.append(audio.calculate_rms(isolate=accurate))
-            if len(o_rms) > 0:
-                o_rms_value = sum(o_rms) / len(o_rms)
-            # adjust rms for each file
-            for vl_file in vl_files[vl_file_base]:
-                voice_line = Audio(path=work_folder + "/" + vl_file, logs=log, config=l_config)
-                vl_rms_value = voice_line.calculate_rms(isolate=accurate)
-                scaling_factor = (o_rms_value / vl_rms_value) * l_config.config["Settings"]["volume_multiplier"]
-                print("applying scaling factor ", scaling_factor)
-                voice_line.audio *= scaling_factor
-                scaling.append(scaling_factor)
-                sf.write(voice_line.path, voice_line.audio, voice_line.sr)
-                adjusted_number += 1
+    lufs = l_config.config["Advanced Settings"].get("volume_adjustment_mode", "rms") == "lufs"
+    vl_folder = FileManagement(path=work_folder, logs=l_log, config=l_config)
+    vl_files = vl_folder.get_folder_content(file_filter=work_extension, raw=False)
+    if file_paths is not None:
+        selected = {os.path.basename(file_path) for file_path in file_paths}
+        vl_files = {base: [f for f in files if f in selected] for base, files in vl_files.items()}
+    # The gain is applied once per file even if the adjustment is interrupted and launched again
+    journal = JobJournal("adjust_volume" + suffix,
+                         {"mode": "lufs" if lufs else "rms",
+                          "accurate": l_config.config["Advanced Settings"]["accurate_volume_adjustment"],
+                          "volume_multiplier": l_config.config["Settings"]["volume_multiplier"]},
+                         l_log, l_config).open()
+    vl_files = {base: [f for f in files if not journal.is_done(work_folder + "/" + f)]
+                for base, files in vl_files.items()}
+    vl_files = {base: files for base, files in vl_files.items() if len(files) > 0}
+    completed = False
+    try:
+        plan, planned = plan_volume(vl_files, l_log, l_config, pool, progress=progress, suffix=suffix)
+        gains = {work_folder + "/" + name: plan["lines"][name]["gain"] for name in planned
+                 if not plan["lines"][name]["skip"]}
+        handled = set()
+
+        # Replace the voice line as soon as its job ends, its measure is updated with the applied gain
+        def commit(future, file_path):
+            nonlocal adjusted_number
+            handled.add(file_path)
+            try:
+                journal.commit(file_path, future.result())
+            except Exception as e:
+                l_log.write_log(f"WARN: Can't adjust the volume of {file_path}: {e}")
+                return None
+            gain, line = gains[file_path], plan["lines"][os.path.basename(file_path)]
+            line["level"] = line["level"] + 20 * np.log10(gain) if lufs else line["level"] * gain
+            line["signature"] = get_file_signature(file_path)
+            adjusted_number += 1
+
+        futures = pool.map_files(apply_volume_gain, list(gains), l_config=l_config, steps=["gain"],
+                                 file_args={file_path: (gain,) for file_path, gain in gains.items()})
+        try:
+            wait_jobs(futures, progress, "adjust volume", on_done=commit)
+        finally:
+            # The jobs already running when the adjustment is cancelled are kept
+            for future, file_path in futures.items():
+                if file_path not in handled and not future.cancel():
+                    commit(future, file_path)
+            save_json(get_gain_plan_path(l_config, suffix=suffix), plan)
+        l_log.write_log(f"INFO: Volume adjustment, {adjusted_number} lines adjusted, {len(planned) - len(gains)} "
+                        f"within {l_config.config['Advanced Settings']['volume_gain_tolerance']} dB left unchanged")
+        completed = True
+    finally:
+        if completed:
+            journal.finish()
         else:
-            log.write_log(
-                f"WARN: {vl_file_base} does not exist in the original voice folder, you may check your folders")
+            journal.close()
     return adjusted_number
 
 
@@ -105,16 +577,21 @@ def open_file(file_path):
     return None
 
 
-def check_audio_files(folder_path, l_log: 'Logs', l_config: 'Configuration', auto_del=False):
+def check_audio_files(folder_path, l_log: 'Logs', l_config: 'Configuration', auto_del=False,
+                      progress: 'Progress' = None):
+    progress = progress or Progress()
     # Check if some file have an anormal rms
     l_log.write_log(f"INFO: Checking the file, auto delete: {auto_del}")
-    extension = "." + l_config.config["Static settings"]["audio_format"]
+    extension = "." + l_config.get_workspace_format()
     rms_values, wrong_files = [], []
     folder = FileManagement(folder_path, logs=l_log, config=l_config)
     files = list(folder.get_folder_content(raw=True, file_filter=extension))
+    progress.start("check files", len(files))
     for file_name in files:
         audio = Audio(path=folder_path + "/" + file_name, logs=l_log, config=l_config)
         rms_values.append(audio.calculate_rms())
+        audio.release()
+        progress.advance(audio.path)
     rms_mean = sum(rms_values) / len(rms_values)
     for i in range(len(rms_values)):
         if rms_values[i] > 100 * rms_mean or rms_values[i] < 0.01 * rms_mean:
@@ -127,13 +604,16 @@ def check_audio_files(folder_path, l_log: 'Logs', l_config: 'Configuration', aut
     return wrong_files
 
 
-def check_names(folder_path, l_log: 'Logs', l_config: 'Configuration', auto_correction: bool = True):
+def check_names(folder_path, l_log: 'Logs', l_config: 'Configuration', auto_correction: bool = True,
+                progress: 'Progress' = None):
+    progress = progress or Progress()
     l_log.write_log("INFO: Checking file names")
     missing_files = []
     folder = FileManagement(folder_path, logs=l_log, config=l_config)
-    extension = "." + l_config.config["Static settings"]["audio_format"]
+    extension = "." + l_config.get_workspace_format()
     separator = l_config.config["Static settings"]["name_separator"]
     files = folder.get_folder_content(raw=False, file_filter=extension)
+    progress.start("check names", len(files))
     for file_base_name in files:
         numbers, missing_numbers, file_names = [], [], []
         for file_name in files[file_base_name]:
@@ -153,6 +633,8 @@ def check_names(folder_path, l_log: 'Logs', l_config: 'Configuration', auto_corr
                     os.rename(os.path.join(folder_path, file_names[i] + extension),
                               os.path.join(folder_path, new_file_name))
                     j += 1
+        # Names are only read, a group counts as one step without bytes
+        progress.advance(num_bytes=0)
     return missing_files
 
 
@@ -166,7 +648,7 @@ def compile_voice_lines(folder_path, l_log: 'Logs', l_config: 'Configuration'):
     t = np.linspace(0, 0.1, int(sample_rate * 0.1), endpoint=False)  # Time axis
     separator = 0.5 * np.sin(2 * np.pi * 144 * t)
     full_audio = []
-    extension = "." + l_config.config["Static settings"]["audio_format"]
+    extension = "." + l_config.get_workspace_format()
     folder = FileManagement(path=folder_path, logs=l_log, config=l_config)
     files = folder.get_folder_content(raw=False, file_filter=extension)
     for file_base_name in files:
@@ -179,6 +661,1103 @@ def compile_voice_lines(folder_path, l_log: 'Logs', l_config: 'Configuration'):
     return None
 
 
+""" -----     LOUDNESS     ------------------------------------------------------------------------------------------"""
+# Gated integrated loudness (LUFS) following ITU-R BS.1770
+
+
+# K-weighting filter (high shelf + high pass) as second-order sections, computed for any sample rate
+def k_weighting_sos(sample_rate):
+    # Stage 1: high shelf modelling the acoustic effect of the head
+    f0, gain_db, q = 1681.974450955533, 3.999843853973347, 0.7071752369554196
+    k = np.tan(np.pi * f0 / sample_rate)
+    vh = 10 ** (gain_db / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf = [(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0,
+             1, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    # Stage 2: RLB high pass
+    f0, q = 38.13547087602444, 0.5003270373238773
+    k = np.tan(np.pi * f0 / sample_rate)
+    a0 = 1 + k / q + k * k
+    high_pass = [1, -2, 1, 1, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    return np.array([shelf, high_pass])
+
+
+# Read an audio file by blocks of frames (2D: frames x channels), raw workspace files are memory-mapped
+def iter_audio_blocks(file_path, sample_rate, block_size=65536):
+    if file_path.endswith(".raw"):
+        audio = read_audio(file_path, sample_rate, mmap=True)
+        for start in range(0, len(audio), block_size):
+            yield np.asarray(audio[start:start + block_size], dtype=np.float64).reshape(-1, 1), sample_rate
+    else:
+        with sf.SoundFile(file_path) as f:
+            for block in f.blocks(blocksize=block_size, always_2d=True, dtype='float64'):
+                yield block, f.samplerate
+
+
+# Stream a file once and return the mean square of the K-weighted signal for each 400ms block (75% overlap)
+def measure_loudness(file_path, sample_rate=44100, block_size=65536):
+    steps, remainder, sos, zi, step = [], np.zeros(0), None, None, 0
+    for block, file_sample_rate in iter_audio_blocks(file_path, sample_rate, block_size=block_size):
+        if sos is None:
+            sos = k_weighting_sos(file_sample_rate)
+            zi = np.zeros((sos.shape[0], 2, block.shape[1]))
+            step = int(0.1 * file_sample_rate)  # blocks are built from 100ms steps
+        filtered, zi = sosfilt(sos, block, axis=0, zi=zi)
+        # Channel weights are 1 for mono / stereo files
+        power = np.concatenate([remainder, np.sum(filtered * filtered, axis=1)])
+        step_number = len(power) // step
+        steps.append(power[:step_number * step].reshape(step_number, step).sum(axis=1))
+        remainder = power[step_number * step:]
+    if sos is None:
+        return np.zeros(0)
+    steps = np.concatenate(steps)
+    if len(steps) < 4:
+        # Line shorter than a block: the whole line is used as a single block
+        total = np.sum(steps) + np.sum(remainder)
+        length = len(steps) * step + len(remainder)
+        return np.array([total / length]) if length > 0 else np.zeros(0)
+    return np.convolve(steps, np.ones(4), mode='valid') / (4 * step)
+
+
+# Apply the absolute (-70 LUFS) and relative (-10 LU) gates to block powers, return the loudness in LUFS
+def integrated_loudness(block_powers):
+    block_powers = np.asarray(block_powers)
+    block_powers = block_powers[block_powers > 10 ** ((-70 + 0.691) / 10)]
+    if len(block_powers) == 0:
+        return -np.inf
+    relative_gate = np.mean(block_powers) * 10 ** (-10 / 10)
+    block_powers = block_powers[block_powers > relative_gate]
+    return -0.691 + 10 * np.log10(np.mean(block_powers))
+
+
+""" -----     JOURNAL     -------------------------------------------------------------------------------------------"""
+
+
+# Journal of the files completed by a job that overwrites the voice lines in place (volume adjustment, enhancement)
+# Each file is written to a temporary file, recorded in the journal and then renamed over the voice line. An interrupted
+# job resumes after its last recorded file: recorded files are skipped, and a recorded file whose rename didn't happen
+# is renamed when the journal is opened again. The journal is deleted when the job completes
+class JobJournal:
+    def __init__(self, job, parameters, l_log: 'Logs', l_config: 'Configuration'):
+        self.job = job
+        self.parameters = parameters
+        self.log = l_log
+        self.path = get_cache_folder(l_config, character=True) + f"/journal_{job}.jsonl"
+        self.done = {}
+        self.file = None
+
+    def read_entries(self):
+        entries = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        header = json.loads(lines[0]) if lines else None
+        if header != {"job": self.job, "parameters": self.parameters}:
+            self.log.write_log(f"INFO: Journal of a previous '{self.job}' job with other settings discarded")
+            return []
+        for line in lines[1:]:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                break  # last entry cut by the crash
+        return entries
+
+    def open(self):
+        entries = []
+        if os.path.exists(self.path):
+            try:
+                entries = self.read_entries()
+            except (OSError, ValueError) as e:
+                self.log.write_log(f"WARN: Can't read the journal '{self.path}': {e}")
+        for entry in entries:
+            if os.path.exists(entry["temp"]):
+                os.replace(entry["temp"], entry["file"])
+            # A file modified since the job (split again...) has to be processed again
+            if os.path.exists(entry["file"]) and self.get_signature(entry["file"]) == entry["signature"]:
+                self.done[entry["file"]] = entry
+        if len(self.done) > 0:
+            self.log.write_log(f"INFO: Resuming '{self.job}' job, {len(self.done)} files already done")
+        # The journal is written again with the valid entries only
+        self.file = open(self.path, "w", encoding="utf-8")
+        self.file.write(json.dumps({"job": self.job, "parameters": self.parameters}) + "\n")
+        for entry in self.done.values():
+            self.file.write(json.dumps(entry) + "\n")
+        self.sync()
+        return self
+
+    @staticmethod
+    def get_signature(file_path):
+        stat = os.stat(file_path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return None
+
+    def is_done(self, file_path):
+        return file_path in self.done
+
+    # Record a file and replace it with its processed version
+    def commit(self, file_path, temp_path):
+        entry = {"file": file_path, "temp": temp_path, "signature": self.get_signature(temp_path)}
+        self.file.write(json.dumps(entry) + "\n")
+        self.sync()
+        os.replace(temp_path, file_path)
+        self.done[file_path] = entry
+        return None
+
+    # Keep the journal for the next run (the job was interrupted)
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        return None
+
+    # The job completed, the journal is not needed anymore
+    def finish(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        return None
+
+
+""" -----     PIPELINE     ------------------------------------------------------------------------------------------"""
+
+
+# Number of worker processes allowed by the config ('auto' = one per CPU core)
+def get_worker_count(l_config: 'Configuration'):
+    workers = l_config.config["Advanced Settings"].get("workers", "auto")
+    if workers == "auto" or not isinstance(workers, int) or workers < 1:
+        return os.cpu_count() or 1
+    return workers
+
+
+# Split a dubbed track into voice lines, return the number of saved lines
+def split_track(track_path, output_folder, l_log: 'Logs', l_config: 'Configuration', progress: 'Progress' = None):
+    audio_track = Audio(path=track_path, logs=l_log, config=l_config)
+    if audio_track.duration < 0.5:
+        l_log.write_log(f"WARN: file '{audio_track.name}' seems empty ({audio_track.duration}). File skipped. ")
+        return 0
+    # The peaks of the track are built while it is decoded, with the split points for the waveform view
+    peaks = PeakPyramid.from_audio(audio_track.audio, audio_track.sr)
+    return save_track_lines(audio_track, peaks, l_config.config["Advanced Settings"]["pre_effect"], output_folder,
+                            l_log, l_config, progress=progress)
+
+
+# Apply the pre effect to a decoded track, split it and save its voice lines and its peaks
+def save_track_lines(audio_track: 'Audio', peaks: 'PeakPyramid', pre_effect, output_folder, l_log: 'Logs',
+                     l_config: 'Configuration', progress: 'Progress' = None):
+    if len(pre_effect) > 1:
+        audio_track.apply_effect(effect=pre_effect, scale=l_config.config["Advanced Settings"]["pre_effect_scale"])
+    segments = audio_track.split_audio(progress=progress)
+    peaks.set_segments(segments, audio_track.sr)
+    save_peak_pyramid(audio_track.path, peaks, l_log, l_config)
+    saved_number = audio_track.save(output_folder=output_folder, segments=segments, name='auto', progress=progress)
+    audio_track.release()
+    return saved_number
+
+
+# Split a track decoded in shared memory (see split_long_track), the noise reduction of its pre effect is already
+# applied in denoised. The shared buffers are released when the job ends
+def split_shared_track(source: 'SharedAudio', denoised: 'SharedAudio', track_path, output_folder, l_log: 'Logs',
+                       l_config: 'Configuration'):
+    with source, denoised:
+        audio_track = Audio(path=track_path, logs=l_log, config=l_config)
+        peaks = PeakPyramid.from_audio(source.array, audio_track.sr)
+        audio_track.audio = denoised.array
+        pre_effect = " ".join(effect for effect in l_config.config["Advanced Settings"]["pre_effect"].split(" ")
+                              if effect != "noisereduction")
+        try:
+            return save_track_lines(audio_track, peaks, pre_effect, output_folder, l_log, l_config)
+        finally:
+            audio_track.release()
+
+
+# Split a long track with the noise reduction of its pre effect spread over the pool workers: the track is decoded
+# once in shared memory, each job reduces a noisereduce chunk of it into a shared output and a last job splits it.
+# The jobs only receive the handles of the buffers, whatever the length of the track. The decoding, then the two shared
+# buffers, are held in the memory budget of the pool and the jobs go through its admission. Once the operation is
+# cancelled the jobs not started yet are cancelled
+def split_long_track(track_path, output_folder, pool: 'WorkerPool', l_config: 'Configuration',
+                     cancel_token: 'CancelToken' = None):
+    settings = l_config.config["Advanced Settings"]
+    chunk_size, padding = NOISE_REDUCTION_SETTINGS["chunk_size"], NOISE_REDUCTION_SETTINGS["padding"]
+    progress = Progress(cancel_token=cancel_token)
+    reserved = pool.reserve(estimate_job_memory(track_path, [], l_config), cancel_token=cancel_token)
+    try:
+        audio = read_audio(track_path, l_config.config["Static settings"]["sample_rate"])
+        with SharedAudio.from_array(audio) as source, SharedAudio(source.length) as denoised:
+            del audio
+            buffers = min(reserved, 2 * source.array.nbytes)
+            pool.release(reserved - buffers)
+            reserved = buffers
+            chunk_memory = int((chunk_size + 2 * padding) * np.dtype(np.float32).itemsize *
+                               EFFECT_MEMORY_FACTORS["noisereduction"])
+            jobs = pool.map_jobs(reduce_noise_chunk,
+                                 [(chunk_memory, (source, denoised, start, min(start + chunk_size, source.length)))
+                                  for start in range(0, source.length, chunk_size)],
+                                 settings["noise_reduction"] * settings["pre_effect_scale"],
+                                 settings["noise_reduction_stationary_thresh"], l_config=l_config)
+            wait_jobs({job: track_path for job in jobs}, progress, "reduce noise")
+            for job in jobs:
+                job.result()
+            split_job = pool.map_jobs(split_shared_track,
+                                      [(estimate_job_memory(track_path, ["split"], l_config),
+                                        (source, denoised, track_path, output_folder))], l_config=l_config)[0]
+            wait_jobs({split_job: track_path}, progress, "split track")
+            return split_job.result()
+    finally:
+        pool.release(reserved)
+
+
+# Submit the split jobs of dubbed tracks to the pool, return {future: track path}
+# With a noise reduction pre effect the tracks of several noisereduce chunks are split one after the other by
+# split_long_track (their chunks keep all the workers busy), the other tracks are split by one job each. The long
+# tracks stop at their next chunk once cancel_token is cancelled
+def map_split_jobs(pool: 'WorkerPool', track_paths, output_folder, l_config: 'Configuration',
+                   cancel_token: 'CancelToken' = None):
+    pre_effect = l_config.config["Advanced Settings"]["pre_effect"]
+    sample_rate = l_config.config["Static settings"]["sample_rate"]
+    long_tracks = []
+    if "noisereduction" in pre_effect.split(" ") and pool.workers > 1:
+        for track_path in track_paths:
+            info = get_audio_info(track_path, sample_rate=sample_rate)
+            if info is not None and info.duration * sample_rate >= 4 * NOISE_REDUCTION_SETTINGS["chunk_size"]:
+                long_tracks.append(track_path)
+    futures = pool.map_files(split_track, [t for t in track_paths if t not in long_tracks], output_folder,
+                             l_config=l_config, steps=["split", pre_effect])
+    if len(long_tracks) > 0:
+        long_futures = {Future(): track_path for track_path in long_tracks}
+
+        def run_long_tracks():
+            for future, track_path in long_futures.items():
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(split_long_track(track_path, output_folder, pool, l_config,
+                                                       cancel_token=cancel_token))
+                except Exception as e:
+                    future.set_exception(e)
+
+        threading.Thread(target=run_long_tracks, daemon=True).start()
+        futures.update(long_futures)
+    return futures
+
+
+# Apply a list of effects to a voice line and overwrite it, return the number of enhanced files
+# With keep_temp the voice line is not replaced, the path of the enhanced temporary file is returned (see JobJournal)
+def enhance_voice_line(file_path, effects, l_log: 'Logs', l_config: 'Configuration', keep_temp=False):
+    file = Audio(path=file_path, logs=l_log, config=l_config)
+    for effect in effects:
+        file.apply_effect(effect=effect)
+    if keep_temp:
+        temp_path = write_audio_temp(file.path, file.audio, file.sr, settings=get_encoder_settings(l_config))
+        file.release()
+        return temp_path
+    saved_number = file.save(output_folder=file.folder, name=file.name)
+    file.release()
+    return saved_number
+
+
+# Apply a list of effects to several voice lines, the noise reduction is run on all the lines at once (see
+# reduce_noise_batch) and the other effects line by line. Return the result of enhance_voice_line for each file, None
+# for the files that failed
+def enhance_voice_lines(file_paths, effects, l_log: 'Logs', l_config: 'Configuration', keep_temp=False):
+    files = [Audio(path=file_path, logs=l_log, config=l_config) for file_path in file_paths]
+    for effect in effects:
+        if effect != "noisereduction":
+            for file in files:
+                if file.audio is not None:
+                    file.apply_effect(effect=effect)
+            continue
+        loaded = [file for file in files if file.audio is not None and len(file.audio) > 0]
+        try:
+            strength, stationary = (l_config.config["Advanced Settings"][key] for key in
+                                    ["noise_reduction", "noise_reduction_stationary_thresh"])
+            denoised = reduce_noise_batch([file.audio for file in loaded], l_config.config["Static settings"]
+                                          ["sample_rate"], prop_decrease=strength, stationary=stationary)
+            for file, audio in zip(loaded, denoised):
+                file.audio = audio
+        except Exception as e:
+            l_log.write_log(f"WARN: Failed to apply noise reduction on {len(loaded)} voice lines: {e}")
+    results = []
+    for file in files:
+        try:
+            if file.audio is None:
+                raise ValueError("no audio data")
+            if keep_temp:
+                results.append(write_audio_temp(file.path, file.audio, file.sr,
+                                                settings=get_encoder_settings(l_config)))
+            else:
+                results.append(file.save(output_folder=file.folder, name=file.name))
+        except Exception as e:
+            l_log.write_log(f"WARN: Can't enhance {file.path}: {e}")
+            results.append(None)
+        file.release()
+    return results
+
+
+# Group voice lines of similar durations, about 'seconds' of audio per group (a group per line if seconds is 0),
+# return tuples of file paths
+def group_voice_lines(file_paths, l_config: 'Configuration', seconds):
+    sample_rate = l_config.config["Static settings"]["sample_rate"]
+    durations = []
+    for file_path in file_paths:
+        info = get_audio_info(file_path, sample_rate=sample_rate)
+        durations.append(info.duration if info is not None else 0)
+    groups, group, group_duration = [], [], 0
+    for duration, file_path in sorted(zip(durations, file_paths)):
+        if group and group_duration + duration > seconds:
+            groups.append(tuple(group))
+            group, group_duration = [], 0
+        group.append(file_path)
+        group_duration += duration
+    if group:
+        groups.append(tuple(group))
+    return groups
+
+
+# Submit the enhance jobs of voice lines to the pool, return {future: file path or tuple of file paths}
+# With noise reduction the lines are grouped by duration and a job enhances a whole group (see enhance_voice_lines)
+def map_enhance_jobs(pool: 'WorkerPool', file_paths, effects, l_config: 'Configuration', keep_temp=False):
+    seconds = l_config.config["Advanced Settings"].get("noise_reduction_batch", 0)
+    if "noisereduction" in effects and isinstance(seconds, (int, float)) and seconds > 0:
+        return pool.map_files(enhance_voice_lines, group_voice_lines(file_paths, l_config, seconds), effects,
+                              l_config=l_config, steps=effects, keep_temp=keep_temp)
+    return pool.map_files(enhance_voice_line, file_paths, effects, l_config=l_config, steps=effects,
+                          keep_temp=keep_temp)
+
+
+# Wait for pool jobs, return the sum of their results and the failed files
+def collect_jobs(futures, l_log: 'Logs'):
+    total, failed = 0, []
+    for future, file_path in futures.items():
+        try:
+            for path, result in job_results(file_path, future):
+                if result is None:
+                    failed.append(path)
+                else:
+                    total += result
+        except Exception as e:
+            l_log.write_log(f"WARN: Job failed on '{file_path}': {e}")
+            failed += job_results(file_path)
+    return total, failed
+
+
+# Voice lines split from a dubbed track (track_0, track_1... with the name separator, see Audio.save)
+def get_track_lines(track_path, vl_folder, extension, separator="_"):
+    pattern = re.compile(re.escape(os.path.splitext(os.path.basename(track_path))[0]) + re.escape(separator) + r"\d+" +
+                         re.escape(extension))
+    if not os.path.isdir(vl_folder):
+        return []
+    return sorted(vl_folder + "/" + f for f in os.listdir(vl_folder) if pattern.fullmatch(f))
+
+
+# Run the split -> adjust -> enhance pipeline on some dubbed tracks of the character of the configuration, the voice
+# lines of a previous version of the tracks are replaced and only the new lines are adjusted and enhanced
+def process_tracks(track_paths, l_log: 'Logs', l_config: 'Configuration', effects=None):
+    if effects is None:
+        effects = l_config.config["Advanced Settings"]["pipeline_effects"]
+    effects = [effect for effect in effects.split(" ") if effect]
+    extension = "." + l_config.get_workspace_format()
+    separator = l_config.config["Static settings"]["name_separator"]
+    vl_folder = (l_config.config["Settings"]["workspace_folder"] + "/" + l_config.config["Settings"][
+        "character_voice_folder"] + l_config.config["Static settings"]["voice_lines"])
+    report = {"tracks": [os.path.basename(t) for t in track_paths], "split": 0, "adjusted": 0, "enhanced": 0}
+    for track_path in track_paths:
+        for line_path in get_track_lines(track_path, vl_folder, extension, separator=separator):
+            os.remove(line_path)
+    pool = get_worker_pool(l_config)
+    report["split"], report["failed"] = collect_jobs(map_split_jobs(pool, track_paths, vl_folder, l_config), l_log)
+    lines = [line for track_path in track_paths
+             for line in get_track_lines(track_path, vl_folder, extension, separator=separator)]
+    if len(lines) > 0:
+        report["adjusted"] = adjust_volume(l_log, l_config, file_paths=lines, pool=pool, suffix="_tracks")
+        if len(effects) > 0:
+            report["enhanced"], failed = collect_jobs(map_enhance_jobs(pool, lines, effects, l_config), l_log)
+            report["failed"] += failed
+    return report
+
+
+# Replace the game voice lines of a character with the workspace ones
+# Return the number of pushed files, the files that don't exist in the game and the number of line groups,
+# or None if there is nothing to push
+def push_voice_lines(character, l_log: 'Logs', l_config: 'Configuration', push_all=True, delete_all=False):
+    extension = "." + l_config.config["Static settings"]["audio_format"]
+    vl_folder_path = (l_config.config["Settings"]["workspace_folder"] + "/" +
+                      l_config.config["Settings"]["character_voice_folder"] +
+                      l_config.config["Static settings"]["voice_lines"])
+    vo_folder_path = l_config.config["Settings"]["voice_folder"] + "/" + character
+    check_names(folder_path=vl_folder_path, l_config=l_config, l_log=l_log,
+                auto_correction=not is_aligned(vl_folder_path, l_config))
+    vl_fld = FileManagement(path=vl_folder_path, logs=l_log, config=l_config)
+    vo_fld = FileManagement(path=vo_folder_path, logs=l_log, config=l_config)
+    vl_files = vl_fld.get_folder_content(raw=False, file_filter="." + l_config.get_workspace_format())
+    if len(vl_files) == 0:
+        l_log.write_log(f"WARN: {vl_folder_path} seems empty, stopping push"
+                        f"\n     Make sure you have split the dubbed tracks before trying to push")
+        return None
+    vo_files = vo_fld.get_folder_content(raw=False, file_filter=extension)
+    # Backup the game files before they are modified
+    if l_config.config["Advanced Settings"].get("snapshot_before_push", True):
+        SnapshotStore(l_log, l_config).snapshot(character, vo_folder_path)
+    wrong, done, to_export = [], False, []
+    if delete_all:
+        done = clear_directory(vo_folder_path)
+        if done is not True:
+            l_log.write_log(f"WARN: {vo_folder_path} can't be cleared: {done}")
+    for vl_base_name in vl_files:
+        if vl_base_name in vo_files:
+            if not delete_all and done != True:
+                for file_name in vo_files[vl_base_name]:  # Remove the original files
+                    os.remove(vo_folder_path + "/" + file_name)
+            for file_name in vl_files[vl_base_name]:  # Add the new files
+                to_export.append(file_name)
+        else:
+            for file_name in vl_files[vl_base_name]:  # count number of wrong files
+                wrong.append(file_name)
+                if push_all:
+                    to_export.append(file_name)
+    # Encode (or copy) the voice lines to the game format
+    num = export_voice_lines([(vl_folder_path + "/" + file_name,
+                               vo_folder_path + "/" + os.path.splitext(file_name)[0] + extension)
+                              for file_name in to_export], l_log=l_log, l_config=l_config)
+    return num, wrong, len(vl_files)
+
+
+""" -----     SNAPSHOTS     -----------------------------------------------------------------------------------------"""
+
+
+# Content-addressed backup of the game voice folders: every file is stored once as a blob named by its sha256,
+# a snapshot is a small manifest (file name: blob) so unchanged files cost nothing in later snapshots
+class SnapshotStore:
+    def __init__(self, logs: 'Logs', config: 'Configuration'):
+        self.log = logs
+        self.config = config
+        self.folder = config.config["Settings"]["workspace_folder"] + config.config["Static settings"]["snapshot_folder"]
+        self.blob_folder = self.folder + "/blobs"
+        self.index_path = self.folder + "/index.json"
+        os.makedirs(self.blob_folder, exist_ok=True)
+        # Known hashes of the game files: path: [size, mtime, sha256], files are only hashed again when they change
+        self.index = load_json(self.index_path, default={})
+
+    @staticmethod
+    def hash_file(file_path):
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def blob_path(self, digest):
+        return f"{self.blob_folder}/{digest[:2]}/{digest}"
+
+    # Hash of a file, from the index if the file didn't change since the last snapshot
+    def get_digest(self, file_path):
+        stat = os.stat(file_path)
+        known = self.index.get(os.path.abspath(file_path))
+        if known is not None and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+        digest = self.hash_file(file_path)
+        self.index[os.path.abspath(file_path)] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    # Add a file to the store if its content is not already there, return its hash
+    def store_file(self, file_path):
+        digest = self.get_digest(file_path)
+        blob_path = self.blob_path(digest)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            temp_path = f"{blob_path}.{threading.get_ident()}.tmp"
+            shutil.copyfile(file_path, temp_path)
+            os.replace(temp_path, blob_path)
+        return digest
+
+    # Snapshot all the files of a character voice folder, return the snapshot id
+    def snapshot(self, character, folder_path, workers=8):
+        start_ = time.time()
+        file_names = [f for f in os.listdir(folder_path) if os.path.isfile(os.path.join(folder_path, f))]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            digests = list(executor.map(self.store_file, [os.path.join(folder_path, f) for f in file_names]))
+        snapshot_id = time.strftime("%Y-%m-%d_%H-%M-%S", time.localtime())
+        if os.path.exists(f"{self.folder}/{character}/{snapshot_id}.json"):
+            snapshot_id += f"_{int(time.time() * 1000) % 1000:03d}"
+        manifest = {"id": snapshot_id, "character": character, "created": time.time(),
+                    "files": dict(zip(file_names, digests))}
+        os.makedirs(f"{self.folder}/{character}", exist_ok=True)
+        save_json(f"{self.folder}/{character}/{snapshot_id}.json", manifest)
+        save_json(self.index_path, self.index)
+        self.log.write_log(f"INFO: Snapshot {snapshot_id} of {character}: {len(file_names)} files saved in "
+                           f"{round(time.time() - start_, 2)} seconds")
+        return snapshot_id
+
+    # Snapshots of a character, most recent first
+    def list_snapshots(self, character):
+        character_folder = f"{self.folder}/{character}"
+        if not os.path.isdir(character_folder):
+            return []
+        return sorted((f[:-len(".json")] for f in os.listdir(character_folder) if f.endswith(".json")), reverse=True)
+
+    # Copy a blob back to the game files, the copy is known to have the same hash
+    def restore_file(self, digest, file_path):
+        shutil.copyfile(self.blob_path(digest), file_path)
+        stat = os.stat(file_path)
+        self.index[os.path.abspath(file_path)] = [stat.st_size, stat.st_mtime_ns, digest]
+        return file_path
+
+    # Put the character voice folder back in the state of a snapshot: files missing or modified are copied back from
+    # the store and files that were not in the snapshot are removed
+    def restore(self, character, snapshot_id, folder_path, workers=8):
+        start_ = time.time()
+        manifest = load_json(f"{self.folder}/{character}/{snapshot_id}.json")
+        if manifest is None:
+            self.log.write_log(f"WARN: Snapshot {snapshot_id} of {character} can't be found")
+            return 0
+        os.makedirs(folder_path, exist_ok=True)
+        for file_name in os.listdir(folder_path):
+            file_path = os.path.join(folder_path, file_name)
+            if file_name not in manifest["files"] and os.path.isfile(file_path):
+                os.remove(file_path)
+        to_copy = []
+        for file_name, digest in manifest["files"].items():
+            file_path = os.path.join(folder_path, file_name)
+            if not os.path.exists(file_path) or self.get_digest(file_path) != digest:
+                to_copy.append((digest, file_path))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(lambda pair: self.restore_file(*pair), to_copy))
+        save_json(self.index_path, self.index)
+        self.log.write_log(f"INFO: Snapshot {snapshot_id} of {character} restored: {len(to_copy)} files copied in "
+                           f"{round(time.time() - start_, 2)} seconds")
+        return len(to_copy)
+
+
+""" -----     WORKER POOL     ---------------------------------------------------------------------------------------"""
+
+
+# State of a worker process: its logger, the folder of the settings snapshots and the ones already loaded
+_worker_state = {"log": None, "folder": None, "configs": {}}
+
+
+# Run once when a worker process starts: load the DSP modules and their lazily imported parts
+def _init_worker(settings_folder):
+    _worker_state["log"] = Logs()
+    _worker_state["folder"] = settings_folder
+    try:
+        audio = np.random.default_rng(0).standard_normal(8192).astype(np.float32) * 0.1
+        librosa.feature.rms(y=audio)
+        librosa.amplitude_to_db(np.abs(audio), ref=np.max)
+        nr.reduce_noise(y=audio, sr=44100)
+        sosfilt(butter(N=2, Wn=[100, 8000], btype='band', fs=44100, output='sos'), audio)
+    except Exception as e:
+        print("Worker warm up failed: ", e)
+
+
+def _warm_up():
+    return os.getpid()
+
+
+# Run a job in a worker, the settings snapshot of the job is loaded once per worker and per version
+def _run_job(version, function, args, kwargs):
+    configs = _worker_state["configs"]
+    if version not in configs:
+        settings = load_json(f"{_worker_state['folder']}/{version}.json")
+        configs[version] = Configuration.from_settings(settings, logs=_worker_state["log"])
+    return function(*args, l_log=_worker_state["log"], l_config=configs[version], **kwargs)
+
+
+# Peak memory of the jobs relative to the decoded samples (float32, mono, working sample rate), measured on each step
+DECODE_MEMORY_FACTOR = 4.5
+EFFECT_MEMORY_FACTORS = {"noisereduction": 17, "retrim": 5, "compression": 4, "desaturation": 3.25, "bandpass": 3,
+                         "sinus": 3, "softclip": 3, "gain": 1.25, "fade": 1.25, "split": 5}
+
+
+# Estimated peak memory (bytes) of a job processing a file with a chain of steps, from the file metadata only
+def estimate_job_memory(file_path, steps, l_config: 'Configuration'):
+    # A job on a group of files holds all of them
+    if isinstance(file_path, tuple):
+        return sum(estimate_job_memory(path, steps, l_config) for path in file_path)
+    sample_rate = l_config.config["Static settings"]["sample_rate"]
+    info = get_audio_info(file_path, sample_rate=sample_rate)
+    if info is None:
+        return 0
+    samples = max(int(info.duration * sample_rate), info.frames * info.channels)
+    factor = max([DECODE_MEMORY_FACTOR] + [EFFECT_MEMORY_FACTORS.get(step, 2) for step in steps])
+    return int(samples * np.dtype(np.float32).itemsize * factor)
+
+
+# Physical memory of the computer in bytes, None if it can't be read
+def get_total_memory():
+    try:
+        if os.name == "nt":
+            import ctypes
+
+            class MemoryStatus(ctypes.Structure):
+                _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                            ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                            ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                            ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                            ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+            status = MemoryStatus()
+            status.dwLength = ctypes.sizeof(MemoryStatus)
+            ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status))
+            return status.ullTotalPhys
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+# Memory the parallel jobs may use together, in bytes ('auto' = half of the physical memory)
+def get_memory_budget(l_config: 'Configuration'):
+    budget = l_config.config["Advanced Settings"].get("memory_budget", "auto")
+    if isinstance(budget, (int, float)) and budget > 0:
+        return int(budget * 1024 * 1024)
+    total = get_total_memory()
+    return total // 2 if total else 2 * 1024 ** 3
+
+
+# Float32 samples in shared memory, pickled as a handle (name and length): a worker process views the same memory as
+# a NumPy array without any copy, and writes its results in place. The process that creates the buffer owns it, the
+# with block (or close and unlink) releases it; in a worker the with block only closes its view
+class SharedAudio:
+    def __init__(self, length, name=None):
+        self.length = length
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner,
+                                              size=max(1, length) * np.dtype(np.float32).itemsize)
+        self.array = np.ndarray((length,), dtype=np.float32, buffer=self.shm.buf)
+
+    @classmethod
+    def from_array(cls, audio):
+        shared = cls(len(audio))
+        shared.array[:] = audio
+        return shared
+
+    def __reduce__(self):
+        return SharedAudio, (self.length, self.shm.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        self.unlink()
+        return False
+
+    # The views of the array must be released before
+    def close(self):
+        self.array = None
+        self.shm.close()
+        return None
+
+    def unlink(self):
+        if self.owner:
+            self.shm.unlink()
+            self.owner = False
+        return None
+
+
+# Long-lived pool of worker processes, started on first use and kept for the whole session
+# Jobs are functions taking l_log and l_config keyword arguments, the workers provide their own logger and the
+# settings of the submitting configuration
+class WorkerPool:
+    def __init__(self, workers, memory_budget=2 * 1024 ** 3):
+        self.workers = workers
+        self.memory_budget = memory_budget
+        self.executor = None
+        self.settings_folder = None
+        self.versions = set()
+        self._lock = threading.Lock()
+        # Memory and number of the jobs admitted by map_jobs and not finished yet, with the reserved memory
+        self.used_memory, self.running = 0, 0
+        self._admission = threading.Condition()
+
+    # Start the worker processes (if needed) and make them load the DSP modules
+    def start(self, warm=False):
+        with self._lock:
+            if self.executor is None:
+                self.settings_folder = tempfile.mkdtemp(prefix="voicelinetoolkit_")
+                if os.name != "nt":
+                    # The workers share the resource tracker of this process, it knows when a SharedAudio is freed
+                    resource_tracker.ensure_running()
+                self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                    initargs=(self.settings_folder,))
+                if warm:
+                    for _ in range(self.workers):
+                        self.executor.submit(_warm_up)
+        return self.executor
+
+    # Write the settings of a configuration for the workers (once per version), return the version
+    def publish(self, l_config):
+        data = json.dumps(l_config.config, sort_keys=True)
+        version = hashlib.sha1(data.encode("utf-8")).hexdigest()[:16]
+        with self._lock:
+            if version not in self.versions:
+                path = f"{self.settings_folder}/{version}.json"
+                with open(path + ".tmp", "w", encoding="utf-8") as f:
+                    f.write(data)
+                os.replace(path + ".tmp", path)
+                self.versions.add(version)
+        return version
+
+    def submit(self, function, *args, l_config: 'Configuration', **kwargs):
+        executor = self.start()
+        return executor.submit(_run_job, self.publish(l_config), function, args, kwargs)
+
+    # Submit a job for each file (the file, or a tuple of files, is the first argument of the function), return
+    # {future: file path}
+    # The biggest files are started first, and a job only starts when its estimated memory fits in the budget with the
+    # jobs already running. A job bigger than the whole budget runs alone. steps are the effects applied by the jobs,
+    # file_args ({file path: arguments}) are passed after the file to the job of each file
+    def map_files(self, function, file_paths, *args, l_config: 'Configuration', steps=(), file_args=None, **kwargs):
+        jobs = sorted(((estimate_job_memory(file_path, steps, l_config), file_path) for file_path in file_paths),
+                      key=lambda job: job[0], reverse=True)
+        futures = self.map_jobs(function, [(memory, (file_path,) + (file_args or {}).get(file_path, ()))
+                                           for memory, file_path in jobs], *args, l_config=l_config, **kwargs)
+        return {future: file_path for future, (memory, file_path) in zip(futures, jobs)}
+
+    # Submit jobs given as (estimated memory, arguments) in this order with the admission of map_files, return their
+    # futures. A cancelled future is not started
+    def map_jobs(self, function, jobs, *args, l_config: 'Configuration', **kwargs):
+        jobs = [(memory, arguments, Future()) for memory, arguments in jobs]
+        threading.Thread(target=self._dispatch, args=(jobs, function, args, kwargs, l_config), daemon=True).start()
+        return [future for memory, arguments, future in jobs]
+
+    def _dispatch(self, jobs, function, args, kwargs, l_config):
+        for memory, arguments, future in jobs:
+            # Jobs cancelled while they were queued are skipped without waiting for their admission
+            if future.cancelled():
+                future.set_running_or_notify_cancel()
+                continue
+            memory = min(memory, self.memory_budget)
+            # Cancelling the job wakes the dispatcher up
+            future.add_done_callback(lambda _: self._notify())
+            with self._admission:
+                self._admission.wait_for(lambda: future.cancelled() or self.running == 0 or (
+                        self.running < self.workers and self.used_memory + memory <= self.memory_budget))
+                self.used_memory += memory
+                self.running += 1
+            # Jobs cancelled while they were waiting are skipped
+            if not future.set_running_or_notify_cancel():
+                self._end_job(memory)
+                continue
+            try:
+                job = self.submit(function, *arguments, *args, l_config=l_config, **kwargs)
+            except Exception as e:
+                self._end_job(memory)
+                future.set_exception(e)
+                continue
+            job.add_done_callback(lambda job, future=future, memory=memory: self._finish(job, future, memory))
+        return None
+
+    def _end_job(self, memory):
+        with self._admission:
+            self.used_memory -= memory
+            self.running -= 1
+            self._admission.notify_all()
+        return None
+
+    def _notify(self):
+        with self._admission:
+            self._admission.notify_all()
+        return None
+
+    # Hold memory used outside the jobs (a track decoded by the caller...) in the budget, wait until it fits with the
+    # admitted jobs. Memory bigger than the whole budget is reserved when nothing else is. Return the reserved memory
+    def reserve(self, memory, cancel_token: 'CancelToken' = None):
+        memory = min(memory, self.memory_budget)
+        with self._admission:
+            while self.used_memory > 0 and self.used_memory + memory > self.memory_budget:
+                if cancel_token is not None:
+                    cancel_token.check()
+                self._admission.wait(timeout=0.1)
+            self.used_memory += memory
+        return memory
+
+    def release(self, memory):
+        with self._admission:
+            self.used_memory -= memory
+            self._admission.notify_all()
+        return None
+
+    def _finish(self, job, future, memory):
+        self._end_job(memory)
+        if job.cancelled():
+            future.set_exception(OperationCancelled("Job cancelled"))
+        elif job.exception() is not None:
+            future.set_exception(job.exception())
+        else:
+            future.set_result(job.result())
+        return None
+
+    def shutdown(self):
+        with self._lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True, cancel_futures=True)
+                self.executor = None
+                shutil.rmtree(self.settings_folder, ignore_errors=True)
+                self.versions = set()
+        return None
+
+
+_worker_pool = None
+
+
+# Get the session worker pool, it is re-created only if the number of workers changes
+def get_worker_pool(l_config: 'Configuration', workers=None):
+    global _worker_pool
+    workers = workers or get_worker_count(l_config)
+    if _worker_pool is not None and _worker_pool.workers != workers:
+        _worker_pool.shutdown()
+        _worker_pool = None
+    if _worker_pool is None:
+        _worker_pool = WorkerPool(workers)
+    _worker_pool.memory_budget = get_memory_budget(l_config)
+    return _worker_pool
+
+
+@atexit.register
+def _shutdown_worker_pool():
+    if _worker_pool is not None:
+        _worker_pool.shutdown()
+
+
+""" -----     BATCH     ---------------------------------------------------------------------------------------------"""
+
+
+# Run the split -> adjust -> enhance -> push pipeline for several characters, every character runs in its own
+# workspace and all the per-file jobs share the session pool of worker processes
+class BatchScheduler:
+    def __init__(self, characters, logs: 'Logs', config: 'Configuration', workers=None, effects=None, push=False,
+                 push_all=False, delete_all=False):
+        self.characters = characters
+        self.log = logs
+        self.config = config
+        self.workers = workers or get_worker_count(config)
+        if effects is None:
+            effects = config.config["Advanced Settings"]["pipeline_effects"]
+        self.effects = [effect for effect in effects.split(" ") if effect]
+        self.push = push
+        self.push_all = push_all
+        self.delete_all = delete_all
+        self.reports = {}
+
+    def run_character(self, character, pool):
+        start_ = time.time()
+        l_config = self.config.for_character(character)
+        report = {"character": character, "split": 0, "adjusted": 0, "enhanced": 0, "pushed": 0, "failed": []}
+        workspace = l_config.workspace_folder + "/" + character
+        FileManagement(workspace, logs=self.log, config=l_config).create_folder_tree()
+        dubbed_folder = workspace + l_config.dubbed_tracks
+        vl_folder = workspace + l_config.voice_lines
+        # Split
+        tracks = FileManagement(dubbed_folder, logs=self.log, config=l_config).get_folder_content(
+            raw=True, file_filter='.ogg')
+        report["split"], failed = collect_jobs(map_split_jobs(pool, [dubbed_folder + "/" + t for t in tracks],
+                                                              vl_folder, l_config), self.log)
+        report["failed"] += failed
+        # Adjust
+        if report["split"] > 0:
+            report["adjusted"] = adjust_volume(self.log, l_config, pool=pool)
+        # Enhance
+        if len(self.effects) > 0:
+            lines = FileManagement(vl_folder, logs=self.log, config=l_config).get_folder_content(
+                raw=True, file_filter="." + l_config.get_workspace_format())
+            report["enhanced"], failed = collect_jobs(map_enhance_jobs(pool, [vl_folder + "/" + v for v in lines],
+                                                                       self.effects, l_config), self.log)
+            report["failed"] += failed
+        # Push
+        if self.push:
+            result = push_voice_lines(character, self.log, l_config, push_all=self.push_all,
+                                      delete_all=self.delete_all)
+            if result is not None:
+                report["pushed"], report["not_original"] = result[0], result[1]
+        report["seconds"] = round(time.time() - start_, 2)
+        self.log.write_log(f"INFO: Batch, {character} done: {report['split']} split, {report['adjusted']} adjusted, "
+                           f"{report['enhanced']} enhanced, {report['pushed']} pushed in {report['seconds']} seconds")
+        return report
+
+    def run(self):
+        self.log.write_log(f"INFO: Batch started for {len(self.characters)} characters with {self.workers} workers")
+        pool = get_worker_pool(self.config, workers=self.workers)
+        # The workers are forked before the coordinator threads exist, a fork can't copy a lock held by another thread
+        pool.start(warm=True)
+        with ThreadPoolExecutor(max_workers=max(1, len(self.characters))) as coordinators:
+            futures = {coordinators.submit(self.run_character, character, pool): character
+                       for character in self.characters}
+        for future, character in futures.items():
+            try:
+                self.reports[character] = future.result()
+            except Exception as e:
+                self.log.write_log(f"WARN: Batch failed for {character}: {e}")
+                self.reports[character] = {"character": character, "error": str(e)}
+        return self.reports
+
+    # Write the reports of all the characters in the workspace folder
+    def save_reports(self):
+        path = (self.config.workspace_folder + "/batch_report_" +
+                time.strftime("%Y-%m-%d_%H-%M-%S", time.localtime()) + ".json")
+        with open(path, "w") as f:
+            json.dump(self.reports, f, indent=2)
+        return path
+
+
+""" -----     WATCH     ---------------------------------------------------------------------------------------------"""
+
+
+# inotify events that wake the watcher up (file written, moved in, created, modified or deleted)
+INOTIFY_MASK = 0x8 | 0x80 | 0x100 | 0x2 | 0x200
+
+
+# File descriptor notified when the content of a folder changes (inotify, Linux), None if it's not available
+def open_inotify(folder):
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(folder), INOTIFY_MASK) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (AttributeError, OSError, TypeError):
+        return None
+
+
+# Watch a folder for new or modified files and hand them to on_ready(file paths) once their writes are settled
+# (same size and modification time for settle seconds, readable audio). The folder is scanned again on each inotify
+# event when it's available, every interval seconds otherwise. The handled files are remembered in state_path, a
+# watcher started without state considers the files already in the folder as handled
+class FolderWatcher:
+    def __init__(self, folder, on_ready, logs: 'Logs', extension=".ogg", settle=2.0, interval=1.0, state_path=None):
+        self.folder = folder
+        self.on_ready = on_ready
+        self.log = logs
+        self.extension = extension
+        self.settle = settle
+        self.interval = interval
+        self.state_path = state_path
+        self.known = None
+        # Changed files waiting for their writes to settle: name: (signature, time of the last change)
+        self.pending = {}
+        self.thread = None
+        self._stop = threading.Event()
+
+    def scan(self):
+        signatures = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(self.extension):
+                    stat = entry.stat()
+                    signatures[entry.name] = [stat.st_size, stat.st_mtime_ns]
+        return signatures
+
+    # Files whose writes are settled, the other changed files are kept pending
+    def get_ready(self):
+        now = time.monotonic()
+        signatures = self.scan()
+        for name, signature in signatures.items():
+            if self.known.get(name) == signature:
+                self.pending.pop(name, None)
+            elif name not in self.pending or self.pending[name][0] != signature:
+                self.pending[name] = (signature, now)
+        ready = []
+        for name, (signature, changed) in list(self.pending.items()):
+            if name not in signatures:
+                del self.pending[name]
+            elif now - changed >= self.settle and signature[0] > 0:
+                # A file that can't be read yet is still being written
+                if get_audio_info(self.folder + "/" + name) is None:
+                    self.pending[name] = (signature, now)
+                else:
+                    ready.append(name)
+        return ready
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            if self.known is None:
+                self.known = load_json(self.state_path, default=None) if self.state_path else None
+                if self.known is None:
+                    self.known = self.scan()
+                    self.save_state()
+            self._stop.clear()
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        return self.thread
+
+    def stop(self, join=True):
+        self._stop.set()
+        if join and self.thread is not None:
+            self.thread.join()
+        return None
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def save_state(self):
+        if self.state_path:
+            save_json(self.state_path, self.known)
+        return None
+
+    def run(self):
+        fd = open_inotify(self.folder)
+        self.log.write_log(f"INFO: Watching '{self.folder}' ({'inotify' if fd is not None else 'polling'})")
+        try:
+            while not self._stop.is_set():
+                try:
+                    ready = self.get_ready()
+                    if len(ready) > 0:
+                        for name in ready:
+                            self.known[name] = self.pending.pop(name)[0]
+                        self.on_ready([self.folder + "/" + name for name in sorted(ready)])
+                        self.save_state()
+                except Exception as e:
+                    self.log.write_log(f"WARN: Watch of '{self.folder}' failed: {e}")
+                timeout = min(self.interval, self.settle) if self.pending else self.interval
+                if fd is None:
+                    self._stop.wait(timeout)
+                elif select.select([fd], [], [], timeout)[0]:
+                    # The events only wake the watcher up, the folder is scanned again
+                    try:
+                        while os.read(fd, 65536):
+                            pass
+                    except BlockingIOError:
+                        pass
+        finally:
+            if fd is not None:
+                os.close(fd)
+        self.log.write_log(f"INFO: Stopped watching '{self.folder}'")
+        return None
+
+
+# Watch the dubbed tracks of the character of the configuration and run the new or modified ones through the
+# pipeline in the background (effects: see process_tracks), on_processed(report) is called after each run from the
+# watcher thread
+def watch_dubbed_tracks(l_log: 'Logs', l_config: 'Configuration', on_processed=None, effects=None):
+    workspace = l_config.config["Settings"]["workspace_folder"] + "/" + l_config.config["Settings"][
+        "character_voice_folder"]
+    FileManagement(workspace, logs=l_log, config=l_config).create_folder_tree()
+    settle = l_config.config["Advanced Settings"]["watch_settle_time"]
+
+    def on_ready(track_paths):
+        start_ = time.time()
+        l_log.write_log(f"INFO: Watch, processing {len(track_paths)} new dubbed tracks")
+        report = process_tracks(track_paths, l_log, l_config, effects=effects)
+        report["seconds"] = round(time.time() - start_, 2)
+        l_log.write_log(f"INFO: Watch, {report['split']} voice lines split, {report['adjusted']} adjusted and "
+                        f"{report['enhanced']} enhanced in {report['seconds']} seconds")
+        if on_processed is not None:
+            on_processed(report)
+
+    watcher = FolderWatcher(workspace + l_config.config["Static settings"]["dubbed_tracks"], on_ready, l_log,
+                            settle=settle, interval=min(1.0, settle),
+                            state_path=get_cache_folder(l_config, character=True) + "/watch_tracks.json")
+    watcher.start()
+    return watcher
+
+
 """ -----     LOGGER     --------------------------------------------------------------------------------------------"""
 
 
@@ -234,7 +1813,7 @@ class Logs:
 
 
 class Configuration:
-    def __init__(self, logs=None):
+    def __init__(self, logs=None, check=True):
         self.name = "config"
         self.extension = ".ini"
         self.folder = ""
@@ -260,7 +1839,8 @@ class Configuration:
                     "volume_multiplier": 1,
                     "open_files": False,
                     "reset_logs": False,
-                    "combine_s_files": False
+                    "combine_s_files": False,
+                    "restore_session": True
                 },
             "Advanced Settings":
                 {
@@ -269,6 +1849,7 @@ class Configuration:
                     "accurate_volume_adjustment": True,
                     "gain": 1,
                     "sinus_pass" : 1,
+                    "softclip_drive": 2,
                     "noise_reduction": 0.6,
                     "noise_reduction_stationary_thresh": 0,
                     "compression_threshold": -45,
@@ -280,12 +1861,26 @@ class Configuration:
                     "bandpass_low": 20,
                     "bandpass_high": 20000,
                     "fading_duration": 0.1,
-                    "double_check_files": True
+                    "double_check_files": True,
+                    "workspace_format": "auto",
+                    "snapshot_before_push": True,
+                    "volume_adjustment_mode": "rms",
+                    "volume_gain_tolerance": 0.1,
+                    "split_mode": "sample",
+                    "split_hysteresis": 6,
+                    "workers": "auto",
+                    "pipeline_effects": "noisereduction bandpass fade",
+                    "alignment_gap_cost": 0.4,
+                    "memory_budget": "auto",
+                    "noise_reduction_batch": 30,
+                    "watch_settle_time": 2,
+                    "encoder_profile": "review",
+                    "push_profile": "final"
 
                 },
             "Static settings":
                 {
-                    "all_effect": 'noisereduction bandpass compression retrim gain desaturation fade',
+                    "all_effect": 'noisereduction bandpass compression retrim softclip gain desaturation fade',
                     "audio_format": "ogg",
                     "sample_rate": 44100,
                     "sub_file_name": "sub_en.csv",
@@ -293,7 +1888,10 @@ class Configuration:
                     "dubbed_tracks": "/DubbedTracks",
                     "voice_lines": "/VoiceLines",
                     "split_thread": "auto",
-                    "name_separator": "_"
+                    "name_separator": "_",
+                    "cache_folder": "/.cache",
+                    "snapshot_folder": "/.snapshots",
+                    "unmatched_lines": "/UnmatchedLines"
                 }
 
         }
@@ -303,7 +1901,16 @@ class Configuration:
         self.workspace_folder = self.config["Settings"]["workspace_folder"]
         self.blank_tracks = self.config["Static settings"]["blank_tracks"]
         self.dubbed_tracks = self.config["Static settings"]["dubbed_tracks"]
-        self.check_config()
+        if check:
+            self.check_config()
+
+    # Configuration built from a settings snapshot, the config file is not read
+    @classmethod
+    def from_settings(cls, settings, logs=None):
+        l_config = cls(logs=logs, check=False)
+        l_config.config = copy.deepcopy(settings)
+        l_config.update_variables()
+        return l_config
 
     def edit(self, section, parameter, value):
         try:
@@ -365,17 +1972,38 @@ class Configuration:
             self.config["Settings"] = dict(config_dict["Settings"])
             self.config["Advanced Settings"] = dict(config_dict["Advanced Settings"])
             self.config["Static settings"] = dict(config_dict["Static settings"])
-            # Update main variables
-            self.VO_folder = self.config["Settings"]["voice_folder"]
-            self.character = self.config["Settings"]["character_voice_folder"]
-            self.workspace_folder = self.config["Settings"]["workspace_folder"]
-            self.blank_tracks = self.config["Static settings"]["blank_tracks"]
-            self.dubbed_tracks = self.config["Static settings"]["dubbed_tracks"]
-            self.voice_lines = self.config["Static settings"]["voice_lines"]
+            self.update_variables()
         except Exception as e:
             self.log.write_log(f"WARN: Importing / Updating config:  {e}")
         return self.config
 
+    # Update main variables
+    def update_variables(self):
+        self.VO_folder = self.config["Settings"]["voice_folder"]
+        self.character = self.config["Settings"]["character_voice_folder"]
+        self.workspace_folder = self.config["Settings"]["workspace_folder"]
+        self.blank_tracks = self.config["Static settings"]["blank_tracks"]
+        self.dubbed_tracks = self.config["Static settings"]["dubbed_tracks"]
+        self.voice_lines = self.config["Static settings"]["voice_lines"]
+        return None
+
+    # Copy of the configuration for another character, nothing is written in the config file
+    def for_character(self, character):
+        character_config = copy.copy(self)
+        character_config.config = copy.deepcopy(self.config)
+        character_config.config["Settings"]["character_voice_folder"] = character
+        character_config.character = character
+        return character_config
+
+    # Format of the voice lines in the workspace: the game format ('auto'), 'wav' (float32) or 'raw' (float32, no
+    # header, memory-mappable). Voice lines are only encoded to the game format when they are pushed.
+    # The format doesn't depend on the encoder profile, the voice lines already in the workspace stay listed
+    def get_workspace_format(self):
+        workspace_format = self.config["Advanced Settings"].get("workspace_format", "auto")
+        if workspace_format not in ("wav", "raw"):
+            return self.config["Static settings"]["audio_format"]
+        return workspace_format
+
     # Write data in the config file
     def write_config(self, section, key, value):
         try:
@@ -491,10 +2119,361 @@ class FileManagement:
             self.log.write_log(fr"WARN: Can't get the folder content properly: {e}")
             return None
 
+    # Get the audio metadata of the files in the folder, nothing is decoded
+    def get_audio_info(self, file_filter=None):
+        infos = {}
+        content = self.get_folder_content(raw=True, file_filter=file_filter)
+        if content is None:
+            return infos
+        for file_name in content:
+            info = get_audio_info(os.path.join(self.path, file_name), l_log=self.log)
+            if info is not None:
+                infos[file_name] = info
+        return infos
+
+    # Memory needed to decode every audio file of the folder (float32, mono, at the working sample rate)
+    def estimate_memory(self, file_filter=None):
+        sample_rate = self.config.config["Static settings"]["sample_rate"]
+        infos = self.get_audio_info(file_filter=file_filter)
+        return sum(int(info.duration * sample_rate) * np.dtype(np.float32).itemsize for info in infos.values())
+
 
 """ -----     AUDIO     ---------------------------------------------------------------------------------------------"""
 
 
+# Transitions (time, entering speech) of a dB envelope sampled every hop samples, using a hysteresis in dB
+def envelope_transitions(envelope, threshold_db, hysteresis, hop, sample_rate, length):
+    # 1 above the enter threshold, 0 below the exit threshold, -1 in between (keep the previous state)
+    decisions = np.where(envelope > threshold_db, 1, np.where(envelope < threshold_db - hysteresis, 0, -1))
+    last_decision = np.where(decisions >= 0, np.arange(len(decisions)), 0)
+    np.maximum.accumulate(last_decision, out=last_decision)
+    state = decisions[last_decision] == 1
+    changes = np.flatnonzero(np.diff(state.astype(np.int8))) + 1
+    segments = []
+    if len(state) > 0 and state[0]:
+        segments = [(0, True)]
+    segments += [(int(i) * hop / sample_rate, bool(state[i])) for i in changes]
+    if len(segments) > 0 and segments[-1][1]:
+        segments.append((length / sample_rate, False))
+    return segments
+
+
+# Levels read by the sample split mode, in dB relative to the loudest sample (floored 80 dB below it, like
+# amplitude_to_db): the first sample, the sample compared to the second one (step samples before it, read from the end
+# of the track) and then one sample every step samples from the second one
+def sample_levels(audio, step):
+    positions = np.arange(1, len(audio), step)
+    magnitude = np.abs(audio[np.concatenate([[0], positions[:1] - step, positions])])
+    levels = librosa.amplitude_to_db(magnitude, ref=np.max(np.abs(audio)) if len(audio) > 0 else 1.0, top_db=None)
+    return np.maximum(levels, -80.0)
+
+
+# Transitions between silence and speech from the levels of sample_levels, each level is compared to the previous one
+def sample_transitions(levels, threshold_db, step, sample_rate, length):
+    previous, current = levels[1:-1], levels[2:]
+    entering = (current > threshold_db) & (previous <= threshold_db)
+    leaving = (current < threshold_db) & (previous >= threshold_db)
+    segments = []
+    if len(levels) > 0 and levels[0] > threshold_db:
+        segments = [(0, True)]
+    segments += [((1 + int(k) * step) / sample_rate, bool(entering[k])) for k in np.flatnonzero(entering | leaving)]
+    if len(segments) > 0 and segments[-1][1]:
+        segments.append((length, False))
+    return segments
+
+
+# Turn speech / silence transitions into (start, end) sample indices of the voice lines
+def merge_segments(segments, length, sample_rate, threshold_duration, minimal_segment_duration, silence_padding):
+    index_list = set()
+    # Merging short silence to audio
+    for i in range(len(segments) - 1):
+        if not segments[i][1]:
+            silence_duration = segments[i + 1][0] - segments[i][0]
+            if silence_duration <= threshold_duration:
+                index_list.update((i, i + 1))
+    segments = [v for i, v in enumerate(segments) if i not in index_list]
+    index_list = set()
+    # Merging short audio to silence
+    for i in range(len(segments) - 1):
+        if segments[i][1]:
+            audible_duration = segments[i + 1][0] - segments[i][0]
+            if audible_duration <= minimal_segment_duration:
+                index_list.update((i, i + 1))
+    segments = [v for i, v in enumerate(segments) if i not in index_list]
+    # Add silence padding
+    for i in range(len(segments)):
+        if segments[i][1]:
+            segments[i] = (max(0, segments[i][0] - silence_padding), True)
+        else:
+            segments[i] = (min((length - 1) / sample_rate, segments[i][0] + silence_padding), False)
+    if not segments[0][1]:  # Make sure that the segments list doesn't start with a False
+        segments.pop(0)
+    segment_iterations = [(int(segments[i][0] * sample_rate), int(segments[i + 1][0] * sample_rate)) for i in
+                          range(0, len(segments), 2)]
+    return segment_iterations
+
+
+# Settings of noisereduce.reduce_noise reproduced by the batched noise reduction (the library defaults)
+NOISE_REDUCTION_SETTINGS = {"n_fft": 1024, "hop_length": 256, "padding": 30000, "chunk_size": 600000,
+                            "time_constant_s": 2.0, "freq_mask_smooth_hz": 500, "time_mask_smooth_ms": 50,
+                            "thresh_n_mult_nonstationary": 2, "sigmoid_slope_nonstationary": 10,
+                            "n_std_thresh_stationary": 1.5}
+
+
+# Split sorted lengths into consecutive groups whose padded size (longest length x count) stays under max_samples
+# and whose longest length is at most max_ratio times the shortest one, return lists of indices
+def group_by_length(lengths, max_samples, max_ratio=1.25):
+    groups, group = [], []
+    for i in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        if group and (lengths[i] > lengths[group[0]] * max_ratio or
+                      lengths[i] * (len(group) + 1) > max_samples):
+            groups.append(group)
+            group = []
+        group.append(i)
+    if group:
+        groups.append(group)
+    return groups
+
+
+# Zero phase smoothing along the frames of each row, the same as filtfilt (padtype=None) run on every row alone.
+# Row i is only kept up to its frame ends[i], the following tails[i] frames of its signal are silent (zero input) and
+# their effect on the backward pass is computed instead of filtered
+def smooth_frames(spectral, ends, tails, b, a):
+    zi = lfilter_zi(b, a)
+    forward, _ = lfilter(b, a, spectral, axis=-1, zi=zi * spectral[..., :1])
+    last = np.take_along_axis(forward, ends[:, None, None], axis=-1)
+    # Output of the backward pass when it reaches the last kept frame, for a unit forward value on that frame
+    gains = np.ones(len(ends))
+    for tail in np.unique(tails[tails > 0]):
+        decay = (1 - b[0]) ** np.arange(tail, -1, -1)
+        gains[tails == tail] = lfilter(b, a, decay, zi=zi * decay[0])[0][-1]
+    # Reverse every row from its last kept frame
+    index = np.maximum(ends[:, None] - np.arange(spectral.shape[-1])[None, :], 0)[:, None, :]
+    reverse = np.take_along_axis(forward, index, axis=-1)
+    backward, _ = lfilter(b, a, reverse, axis=-1, zi=last * (gains[:, None, None] - b[0]))
+    return np.take_along_axis(backward, index, axis=-1)
+
+
+# Spectral gating of a batch of signals (rows of a 2-D array, zero padded after their lengths) in single vectorized
+# STFT / mask / inverse STFT calls, it reproduces noisereduce.reduce_noise on each signal alone.
+# noisereduce surrounds every signal with 'padding' zeros, only the frames of that padding that can change the result
+# are computed here
+def spectral_gate_batch(batch, lengths, sr, prop_decrease=1.0, stationary=False):
+    s = NOISE_REDUCTION_SETTINGS
+    n_fft, hop, padding = s["n_fft"], s["hop_length"], s["padding"]
+    lengths = np.asarray(lengths)
+    n_grad_freq = int(s["freq_mask_smooth_hz"] / (sr / (n_fft / 2)))
+    n_grad_time = int(s["time_mask_smooth_ms"] / ((hop / sr) * 1000))
+    # Frames skipped at the start of the padding (whole frames, so the kept ones fall on the same samples)
+    skipped = max(0, (padding - n_fft) // hop - max(n_grad_time, 1) - 1)
+    lead = padding - skipped * hop
+    tail = min(padding, n_fft + (max(n_grad_time, 1) + 2) * hop)
+    padded = np.zeros((len(batch), lead + batch.shape[1] + tail))
+    padded[:, lead:lead + batch.shape[1]] = batch
+    _, _, sig_stft = stft(padded, nfft=n_fft, noverlap=n_fft - hop, nperseg=n_fft, padded=False, axis=-1)
+    # Last frame of each signal when it is processed alone, the frames after it only hold zeros
+    ends = (lengths + 2 * padding) // hop - skipped
+    valid = (np.arange(sig_stft.shape[-1])[None, :] <= ends[:, None])[:, None, :]
+    abs_sig_stft = np.abs(sig_stft)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        if stationary:
+            # Noise statistics of each signal over its own frames (without the padding)
+            _, _, noise_stft = stft(batch, nfft=n_fft, noverlap=n_fft - hop, nperseg=n_fft, padded=False, axis=-1)
+            noise_frames = np.minimum(lengths, s["chunk_size"]) // hop + 1
+            noise_valid = (np.arange(noise_stft.shape[-1])[None, :] < noise_frames[:, None])[:, None, :]
+            noise_db = 20 * np.log10(np.abs(noise_stft) + np.finfo(np.float64).eps)
+            top = np.max(np.where(noise_valid, noise_db, -np.inf), axis=-1, keepdims=True)
+            noise_db = np.where(noise_valid, np.maximum(noise_db, top - 80.0), 0)
+            mean = noise_db.sum(axis=-1, keepdims=True) / noise_frames[:, None, None]
+            std = np.sqrt((np.where(noise_valid, noise_db - mean, 0) ** 2).sum(axis=-1, keepdims=True) /
+                          noise_frames[:, None, None])
+            sig_db = 20 * np.log10(abs_sig_stft + np.finfo(np.float64).eps)
+            sig_db = np.maximum(sig_db, np.max(sig_db, axis=-1, keepdims=True) - 80.0)
+            sig_mask = (sig_db > mean + std * s["n_std_thresh_stationary"]) * prop_decrease + (1.0 - prop_decrease)
+        else:
+            t_frames = s["time_constant_s"] * sr / float(hop)
+            b = (np.sqrt(1 + 4 * t_frames ** 2) - 1) / (2 * t_frames ** 2)
+            kept_ends = np.minimum(ends, sig_stft.shape[-1] - 1)
+            sig_stft_smooth = smooth_frames(abs_sig_stft, kept_ends, ends - kept_ends, np.array([b]),
+                                            np.array([1, b - 1]))
+            sig_mult_above_thresh = (abs_sig_stft - sig_stft_smooth) / sig_stft_smooth
+            sig_mask = 1 / (1 + np.exp(-(sig_mult_above_thresh - s["thresh_n_mult_nonstationary"]) *
+                                       s["sigmoid_slope_nonstationary"]))
+        sig_mask = np.where(valid, sig_mask, 0)
+        # Smooth the mask over frequencies and frames (never across two signals), the triangular filter of
+        # noisereduce is separable
+        for axis, n_grad in ((1, n_grad_freq), (2, n_grad_time)):
+            if n_grad > 1:
+                kernel = np.concatenate([np.linspace(0, 1, n_grad + 1, endpoint=False), np.linspace(1, 0, n_grad + 2)])
+                sig_mask = convolve1d(sig_mask, kernel[1:-1] / np.sum(kernel[1:-1]), axis=axis, mode="constant")
+        if not stationary:
+            sig_mask = sig_mask * prop_decrease + (1.0 - prop_decrease)
+    _, denoised = istft(sig_stft * sig_mask, nfft=n_fft, noverlap=n_fft - hop, nperseg=n_fft)
+    return [denoised[i, lead:lead + length].astype(batch.dtype) for i, length in enumerate(lengths)]
+
+
+# Noise reduction of the samples [start, end) of a track in shared memory, written in a shared output. The chunk and
+# its padding are the ones noisereduce uses on the whole track (end is a chunk boundary or the end of the track), so
+# reducing all the chunks gives the same samples as reducing the whole track
+def reduce_noise_chunk(source: 'SharedAudio', output: 'SharedAudio', start, end, prop_decrease, stationary,
+                       l_log: 'Logs', l_config: 'Configuration'):
+    s = NOISE_REDUCTION_SETTINGS
+    with source, output:
+        first, last = max(0, start - s["padding"]), min(source.length, start + s["chunk_size"] + s["padding"])
+        chunk = np.zeros(s["chunk_size"] + 2 * s["padding"], dtype=np.float32)
+        chunk[first - start + s["padding"]:last - start + s["padding"]] = source.array[first:last]
+        # The stationary noise statistics come from the start of the track
+        y_noise = np.array(source.array[:s["chunk_size"]]) if stationary else None
+        denoised = nr.reduce_noise(y=chunk, sr=l_config.config["Static settings"]["sample_rate"], stationary=stationary,
+                                   y_noise=y_noise, prop_decrease=prop_decrease, padding=0, chunk_size=len(chunk))
+        output.array[start:end] = denoised[s["padding"]:s["padding"] + end - start]
+    return end - start
+
+
+# Noise reduction of many voice lines, the lines of similar lengths are padded in 2-D batches of at most max_samples
+# samples and gated together. Lines longer than a noisereduce chunk are reduced alone
+def reduce_noise_batch(signals, sr, prop_decrease=1.0, stationary=False, max_samples=2 ** 18):
+    results = [None] * len(signals)
+    lengths = [len(signal) for signal in signals]
+    # The stationary noise statistics need a whole frame, the lines shorter than that are left unchanged
+    unchanged = {i for i, length in enumerate(lengths) if stationary and length < NOISE_REDUCTION_SETTINGS["n_fft"]}
+    for i in unchanged:
+        results[i] = signals[i]
+    short = [i for i, length in enumerate(lengths)
+             if 0 < length <= NOISE_REDUCTION_SETTINGS["chunk_size"] and i not in unchanged]
+    for i in set(range(len(signals))) - set(short) - unchanged:
+        results[i] = nr.reduce_noise(y=signals[i], sr=sr, prop_decrease=prop_decrease, stationary=stationary)
+    for group in group_by_length([lengths[i] for i in short], max_samples):
+        indices = [short[i] for i in group]
+        batch = np.zeros((len(indices), max(lengths[i] for i in indices)), dtype=signals[indices[0]].dtype)
+        for row, i in enumerate(indices):
+            batch[row, :lengths[i]] = signals[i]
+        for i, denoised in zip(indices, spectral_gate_batch(batch, [lengths[i] for i in indices], sr,
+                                                            prop_decrease=prop_decrease, stationary=stationary)):
+            results[i] = denoised
+    return results
+
+
+# Effects that are static curves of the sample amplitude, in the order they are applied
+SHAPING_EFFECTS = ("sinus", "softclip", "gain", "desaturation")
+_waveshapers = {}
+
+
+# Static curve of a shaping stage, the input v is relative to the peak of the stage input. The sinus and soft clip
+# curves are normalized (their output doesn't depend on the level of the input), the desaturation is a knee: the samples
+# above threshold x peak are divided by the reduction
+def shaping_curve(kind, value, v, peak):
+    if kind == "sinus":
+        return np.sin(v / peak * (np.pi / 2))
+    if kind == "softclip":
+        return np.tanh(value * v / peak) / np.tanh(value)
+    if kind == "gain":
+        return v * value
+    threshold, reduction = value
+    return np.where(np.abs(v) > threshold * peak, v / reduction, v)
+
+
+# Stages of the shaping effects selected in an effect list, the sinus is repeated sinus_pass times
+def get_shaping_stages(effects, advanced_settings, scale=1.0):
+    stages = []
+    if "sinus" in effects:
+        stages += [("sinus", None)] * int(advanced_settings["sinus_pass"])
+    if "softclip" in effects:
+        stages.append(("softclip", advanced_settings["softclip_drive"]))
+    if "gain" in effects:
+        stages.append(("gain", scale * advanced_settings["gain"]))
+    if "desaturation" in effects:
+        stages.append(("desaturation", (advanced_settings["desaturation_threshold"],
+                                        advanced_settings["desaturation_reduction"] * scale)))
+    return tuple(stages)
+
+
+# Chain of shaping stages precomputed in a lookup table over the amplitude normalized by the track peak, applied in a
+# single pass whatever the number of stages. Each cell of the table stores its start value and its slope, the grid is
+# aligned on the desaturation knee so the step stays sharp instead of being interpolated
+class Waveshaper:
+    def __init__(self, stages, size=8192):
+        self.stages = tuple(stages)
+        # Without a normalized curve the output follows the level of the track
+        self.normalized = any(kind in ("sinus", "softclip") for kind, _ in self.stages)
+        # Peak of the input of each stage, the curves are monotonic so it is the image of the track peak
+        self.peaks = []
+        peak = 1.0
+        for kind, value in self.stages:
+            self.peaks.append(peak)
+            peak = abs(float(shaping_curve(kind, value, peak, peak)))
+        step = 2 / size
+        knee = self.find_knee()
+        if knee is not None:
+            step = knee / max(1, round(knee / step))
+        self.step = step
+        # Index of the cell starting at 0, the last cell only holds the track peak
+        self.offset = int(np.ceil(1 / step))
+        nodes = (np.arange(2 * self.offset + 2) - self.offset) * step
+        # The cell values are taken just inside the cell, on the right side of the knee for the cell starting on it.
+        # Each cell is stored as a line of the position in the table: intercept + slope x position
+        delta = step * 1e-9
+        start = self.evaluate(nodes[:-1] + delta)
+        self.slope = self.evaluate(nodes[1:] - delta) - start
+        self.intercept = start - self.slope * np.arange(len(start))
+
+    # Output of the first stages (all of them by default) for an input relative to the track peak
+    def evaluate(self, u, stages=None):
+        v = u
+        for (kind, value), peak in list(zip(self.stages, self.peaks))[:stages]:
+            v = shaping_curve(kind, value, v, peak)
+        return v
+
+    # Input level (relative to the track peak) above which the first desaturation applies, found by bisection
+    def find_knee(self):
+        for i, (kind, value) in enumerate(self.stages):
+            if kind == "desaturation" and 0 < value[0] < 1:
+                level, low, high = value[0] * self.peaks[i], 0.0, 1.0
+                for _ in range(64):
+                    middle = (low + high) / 2
+                    if abs(float(self.evaluate(middle, stages=i))) > level:
+                        high = middle
+                    else:
+                        low = middle
+                return high
+        return None
+
+    # Shape a track, float32 samples stay in float32. The samples are processed by chunks that stay in the CPU cache
+    def apply(self, audio, chunk_size=32768):
+        peak = max(np.max(audio), -np.min(audio))
+        if peak == 0:
+            return audio
+        # A single sinus or desaturation is cheaper to compute directly than through the table on float32 samples
+        if len(self.stages) == 1 and self.stages[0][0] in ("sinus", "desaturation") and audio.dtype == np.float32:
+            kind, value = self.stages[0]
+            return shaping_curve(kind, value, audio, peak).astype(np.float32, copy=False)
+        dtype = np.result_type(audio.dtype, np.float32)
+        scale = 1.0 if self.normalized else peak
+        intercept, slope = (self.intercept * scale).astype(dtype), (self.slope * scale).astype(dtype)
+        factor, offset = dtype.type(1 / (peak * self.step)), dtype.type(self.offset)
+        output = np.empty(len(audio), dtype=dtype)
+        size = min(chunk_size, len(audio))
+        positions, indices, products = np.empty(size, dtype), np.empty(size, np.intp), np.empty(size, dtype)
+        for first in range(0, len(audio), chunk_size):
+            last = min(first + chunk_size, len(audio))
+            position, index, product = positions[:last - first], indices[:last - first], products[:last - first]
+            np.multiply(audio[first:last], factor, out=position)
+            position += offset
+            index[...] = position
+            np.take(slope, index, out=product)
+            product *= position
+            np.take(intercept, index, out=output[first:last])
+            output[first:last] += product
+        return output
+
+
+# Waveshaper of a chain of stages, the tables are built once per settings
+def get_waveshaper(stages):
+    if stages not in _waveshapers:
+        _waveshapers[stages] = Waveshaper(stages)
+    return _waveshapers[stages]
+
+
 class Audio:
     def __init__(self, path, config: 'Configuration', logs: 'Logs'):
         self.path = path
@@ -503,18 +2482,55 @@ class Audio:
         self.path = path
         self.log = logs
         self.config = config
-        if os.path.exists(self.path):
-            print(f"Reading audio {self.name} from {self.path}")
-            self.audio = self.read()
+        # The file is only probed here, samples are decoded on first access of self.audio
+        self._audio = None
+        self._loaded = False
+        self.info = None
         self.sr = config.config["Static settings"]["sample_rate"]
-        self.format = '.' + config.config["Static settings"]["audio_format"]
+        if os.path.exists(self.path):
+            self.info = get_audio_info(self.path, l_log=self.log, sample_rate=self.sr)
+        self.format = '.' + config.get_workspace_format()
         self.split_thread = int(0.01 * self.sr)  # default split precision at 10ms
 
+    # Decoded samples, read from the file the first time they are needed
+    @property
+    def audio(self):
+        if not self._loaded and self.info is not None:
+            print(f"Reading audio {self.name} from {self.path}")
+            self._audio = self.read()
+            self._loaded = True
+        return self._audio
+
+    @audio.setter
+    def audio(self, value):
+        self._audio = value
+        self._loaded = True
+
+    # Free the decoded samples, they will be read again from the file if needed
+    def release(self):
+        self._audio = None
+        self._loaded = False
+        return None
+
+    # Duration in seconds, from the file metadata or from the samples if they were set by hand
+    @property
+    def duration(self):
+        if self._loaded and self._audio is not None:
+            return len(self._audio) / self.sr
+        if self.info is not None:
+            return self.info.duration
+        return 0
+
+    # Memory used by the decoded samples (float32, mono, at the working sample rate)
+    def estimate_memory(self):
+        return int(self.duration * self.sr) * np.dtype(np.float32).itemsize
+
     def init_sr(self):
         try:
-            # Open the audio file and retrieve its sample rate
-            with sf.SoundFile(self.path) as audio_file:
-                sample_rate = audio_file.samplerate
+            # Retrieve the sample rate from the file metadata
+            if self.info is None:
+                self.info = sf.info(self.path)
+            sample_rate = self.info.samplerate
             self.config.write_config("Static settings", "sample_rate", sample_rate)
             self.sr = sample_rate
             self.log.write_log(f"INFO: Sample rate updated at {sample_rate} Hz from file '{self.path}'")
@@ -535,11 +2551,11 @@ class Audio:
     # Return the audio
     def read(self):
         try:
-            read_audio, sr = librosa.load(self.path, sr=self.config.config["Static settings"]["sample_rate"])
+            audio = read_audio(self.path, self.config.config["Static settings"]["sample_rate"])
         except Exception as e:
             self.log.write_log(fr"WARN: Can't Read the audio file: {e}")
-            read_audio = None
-        return read_audio
+            audio = None
+        return audio
 
     # Calculate the rms of the audio
     def calculate_rms(self, isolate=False):
@@ -650,15 +2666,17 @@ class Audio:
                 applied = True
             except Exception as e:
                 self.log.write_log(f"WARN: Failed to retrim {self.name}: {e}")
-        if "sinus" in effect:
+        # The shaping effects are composed in one lookup table, the gain alone is a plain multiplication
+        shaping = [kind for kind in SHAPING_EFFECTS if kind in effect]
+        if len(shaping) > 0 and shaping != ["gain"]:
             try:
-                for p in range(self.config.config["Advanced Settings"]["sinus_pass"]):
-                    max_amp = np.max(np.abs(self.audio))
-                    self.audio = np.sin(self.audio / max_amp * (np.pi / 2))
+                stages = get_shaping_stages(shaping, advanced_settings, scale=scale)
+                if len(stages) > 0:
+                    self.audio = get_waveshaper(stages).apply(self.audio)
                     applied = True
             except Exception as e:
-                self.log.write_log(f"WARN: Failed to apply sinus function on {self.name}: {e}")
-        if "gain" in effect:
+                self.log.write_log(f"WARN: Failed to apply {' '.join(shaping)} on {self.name}: {e}")
+        elif len(shaping) > 0:
             try:
                 gain = scale * advanced_settings["gain"]
                 self.audio *= gain
@@ -666,25 +2684,6 @@ class Audio:
                 applied = True
             except Exception as e:
                 self.log.write_log(f"WARN: Failed to apply gain on {self.name}: {e}")
-        if "desaturation" in effect:
-            try:
-                threshold, reduction_factor = (advanced_settings[key] for key in ["desaturation_threshold",
-                                                                                  "desaturation_reduction"])
-                # Trouver la valeur absolue maximale dans l'audio
-                max_val = np.max(np.abs(self.audio))
-                # S'assurer que le max_val n'est pas nul pour éviter la division par zéro
-                if max_val > 0:
-                    normalized_audio = self.audio / max_val
-                else:
-                    normalized_audio = self.audio  # Si l'audio est déjà complètement silencieux
-                # Identify where the audio exceeds the threshold
-                saturated_indices = np.where(np.abs(normalized_audio) > threshold)[0]
-                # Reduce the gain of the saturated parts
-                self.audio[saturated_indices] /= (reduction_factor * scale)
-                # print("desaturation applied")
-                applied = True
-            except Exception as e:
-                self.log.write_log(f"WARN: Failed to apply desaturation on {self.name}: {e}")
         if "fade" in effect:
             try:
                 fade_duration = advanced_settings["fade_duration"]
@@ -748,67 +2747,71 @@ class Audio:
             self.log.write_log(f"WARN: Isolate high amplitude sound segment in {self.path}: {e}")
             return self.audio
 
+    # Frame energy in dB (relative to the loudest frame), one value every split_thread samples
+    # The squared samples are summed once per hop, frames centered on the hop positions are then built from a
+    # cumulative sum of these hop energies
+    def get_energy_envelope(self, frame_duration=0.02):
+        hop = self.split_thread
+        length = len(self.audio)
+        hop_energy = np.add.reduceat(np.square(self.audio, dtype=np.float32), np.arange(0, length, hop))
+        frame_hops = max(1, int(round(frame_duration * self.sr / hop)))
+        cumulative = np.concatenate([[0.0], np.cumsum(hop_energy, dtype=np.float64)])
+        positions = np.arange(len(hop_energy))
+        starts = np.maximum(positions - frame_hops // 2, 0)
+        ends = np.minimum(starts + frame_hops, len(hop_energy))
+        sizes = np.minimum(ends * hop, length) - starts * hop
+        energy = (cumulative[ends] - cumulative[starts]) / np.maximum(sizes, 1)
+        envelope = 10 * np.log10(np.maximum(energy, 1e-20))
+        return envelope - np.max(envelope)
+
+    # Transitions between silence and speech from the frame energy, with hysteresis: a segment starts above the
+    # threshold and only ends when the energy goes below the threshold minus the hysteresis
+    def detect_energy_transitions(self, threshold_db):
+        hysteresis = self.config.config["Advanced Settings"].get("split_hysteresis", 6)
+        return envelope_transitions(self.get_energy_envelope(), threshold_db, hysteresis, self.split_thread,
+                                    self.sr, len(self.audio))
+
+    # Transitions between silence and speech from single samples taken every split_thread samples
+    def detect_sample_transitions(self, threshold_db):
+        return sample_transitions(sample_levels(self.audio, self.split_thread), threshold_db, self.split_thread,
+                                  self.sr, len(self.audio))
+
     # Main function to split audio tracks in multiple lines
-    def split_audio(self):
+    def split_audio(self, progress: 'Progress' = None):
+        progress = progress or Progress()
         try:
+            progress.start("detect silences", 1)
             # Variables
             threshold_db = self.config.config["Settings"]["silent_volume_threshold"]
             threshold_duration = self.config.config["Settings"]["silent_duration_threshold"]
             silence_padding = self.config.config["Settings"]["silence_padding"]
             minimal_segment_duration = self.config.config["Settings"]["minimal_segment_duration"]
-            # Calculate amplitude in dB
-            amplitude = librosa.amplitude_to_db(np.abs(self.audio), ref=np.max)
-            segments = []
-            if amplitude[0] > threshold_db:
-                segments = [(0, True)]
-            # Mark switch between up and down state
-            for i in range(1, len(amplitude), self.split_thread):
-                if amplitude[i] > threshold_db >= amplitude[i - self.split_thread]:
-                    segments.append((i / self.sr, True))  # Entering audible segment
-                elif amplitude[i] < threshold_db <= amplitude[i - self.split_thread]:
-                    segments.append((i / self.sr, False))  # leaving audible segment
-            if segments[-1][1]:
-                segments.append((len(amplitude), False))
-            index_list = []
-            # Merging short silence to audio
-            for i in range(len(segments) - 1):
-                if not segments[i][1]:
-                    silence_duration = segments[i + 1][0] - segments[i][0]
-                    if silence_duration <= threshold_duration:
-                        index_list += (i, i + 1)
-            segments = [v for i, v in enumerate(segments) if i not in index_list]
-            index_list = []
-            # Merging short audio to silence
-            for i in range(len(segments) - 1):
-                if segments[i][1]:
-                    audible_duration = segments[i + 1][0] - segments[i][0]
-                    if audible_duration <= minimal_segment_duration:
-                        index_list += (i, i + 1)
-            segments = [v for i, v in enumerate(segments) if i not in index_list]
-            # Add silence padding
-            for i in range(len(segments)):
-                if segments[i][1]:
-                    segments[i] = (max(0, segments[i][0] - silence_padding), True)
-                else:
-                    segments[i] = (min((len(amplitude) - 1) / self.sr, segments[i][0] + silence_padding), False)
-            if not segments[0][1]:  # Make sure that the segments list doesn't start with a False
-                segments.pop(0)
-            segment_iterations = [(int(segments[i][0] * self.sr), int(segments[i + 1][0] * self.sr)) for i in
-                                  range(0, len(segments), 2)]
-            return segment_iterations
+            if self.config.config["Advanced Settings"].get("split_mode", "sample") == "energy":
+                segments = self.detect_energy_transitions(threshold_db)
+            else:
+                segments = self.detect_sample_transitions(threshold_db)
+            segments = merge_segments(segments, len(self.audio), self.sr, threshold_duration, minimal_segment_duration,
+                                      silence_padding)
+            progress.advance(num_bytes=self.audio.nbytes)
+            return segments
+        except OperationCancelled:
+            raise
         except Exception as e:
             self.log.write_log(f"WARN: Can't split audio '{self.name}': {e}")
             return [(0, 1)]
 
-    def save(self, output_folder, segments=None, name='auto', time_limit=True):
+    def save(self, output_folder, segments=None, name='auto', time_limit=True, progress: 'Progress' = None):
+        progress = progress or Progress()
         audio_type = "audio"
         saved_number = 0
         try:
             if name == 'auto':
                 name = self.name
             path = f'{output_folder}/{name}'
+            separator = self.config.config["Static settings"]["name_separator"]
             if isinstance(segments, list):
                 audio_type = "segment"
+                progress.start("save segments", len(segments))
                 for i, (start, end) in enumerate(segments):
                     if abs(start - end) < 0.2 * self.sr and time_limit:
                         self.log.write_log(
@@ -816,21 +2819,826 @@ class Audio:
                             f"({(end - start) / self.sr} second)")
                         pass
                     segment = self.audio[start:end]
-                    segment_path = f"{path}_{i}{self.format}"
-                    sf.write(segment_path, segment, self.sr, format=self.format[1:])
+                    segment_path = f"{path}{separator}{i}{self.format}"
+                    write_audio(segment_path, segment, self.sr, settings=get_encoder_settings(self.config))
                     saved_number += 1
+                    progress.advance(segment_path, num_bytes=segment.nbytes)
             elif segments == 'empty':
                 audio_type = "empty file"
                 num_samples = int(0.01 * self.sr)
                 empty_audio_data = np.zeros(num_samples)
-                sf.write(path+self.format, empty_audio_data, self.sr, format=self.format[1:])
+                audio_format = self.config.config["Static settings"]["audio_format"]
+                sf.write(path + "." + audio_format, empty_audio_data, self.sr, format=audio_format)
                 saved_number += 1
             else:
-                sf.write(path + self.format, self.audio, self.sr, format=self.format[1:])
+                write_audio(path + self.format, self.audio, self.sr, settings=get_encoder_settings(self.config))
                 saved_number += 1
+        except OperationCancelled:
+            raise
         except Exception as e:
             self.log.write_log(f"WARN: Can't save {audio_type} from '{self.name}': {e}")
         return saved_number
 
 
+""" -----     WAVEFORM     ------------------------------------------------------------------------------------------"""
+
+
+# Min / max of each bin of base_size samples (mono), the block length must be a multiple of base_size except the last
+def block_peaks(block, base_size):
+    block = np.asarray(block, dtype=np.float32)
+    if block.ndim > 1:
+        block = block.mean(axis=1)
+    if len(block) == 0:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+    starts = np.arange(0, len(block), base_size)
+    return np.minimum.reduceat(block, starts), np.maximum.reduceat(block, starts)
+
+
+# Min / max peaks of a track at several resolutions, like the overview files of a DAW: the first level keeps one
+# min / max pair per base_size samples and each next level merges factor bins of the previous one
+class PeakPyramid:
+    def __init__(self, levels, sample_rate, length, base_size=256, factor=4, segments=None):
+        self.levels = levels
+        self.sample_rate = sample_rate
+        self.length = length
+        self.base_size = base_size
+        self.factor = factor
+        self.segments = segments if segments is not None else []
+
+    @classmethod
+    def from_peaks(cls, mins, maxs, sample_rate, length, base_size=256, factor=4, min_bins=256):
+        levels = [(mins, maxs)]
+        while len(levels[-1][0]) > min_bins:
+            mins, maxs = levels[-1]
+            starts = np.arange(0, len(mins), factor)
+            levels.append((np.minimum.reduceat(mins, starts), np.maximum.reduceat(maxs, starts)))
+        return cls(levels, sample_rate, length, base_size=base_size, factor=factor)
+
+    # Build the pyramid from decoded samples
+    @classmethod
+    def from_audio(cls, audio, sample_rate, base_size=256, factor=4):
+        mins, maxs = block_peaks(audio, base_size)
+        return cls.from_peaks(mins, maxs, sample_rate, len(audio), base_size=base_size, factor=factor)
+
+    # Build the pyramid by streaming the file, the whole track is never loaded
+    @classmethod
+    def from_file(cls, file_path, sample_rate=44100, base_size=256, factor=4):
+        mins, maxs, length = [], [], 0
+        for block, sample_rate in iter_audio_blocks(file_path, sample_rate, block_size=base_size * 256):
+            block_mins, block_maxs = block_peaks(block, base_size)
+            mins.append(block_mins)
+            maxs.append(block_maxs)
+            length += len(block)
+        mins = np.concatenate(mins) if mins else np.zeros(0, dtype=np.float32)
+        maxs = np.concatenate(maxs) if maxs else np.zeros(0, dtype=np.float32)
+        return cls.from_peaks(mins, maxs, sample_rate, length, base_size=base_size, factor=factor)
+
+    @property
+    def duration(self):
+        return 1000 * self.length / self.sample_rate
+
+    # Min / max of each of the width columns between start_ms and end_ms, read from the coarsest level that still has
+    # at least one bin per column
+    def get_peaks(self, start_ms, end_ms, width):
+        start = max(0, int(start_ms * self.sample_rate / 1000))
+        end = min(self.length, int(np.ceil(end_ms * self.sample_rate / 1000)))
+        if width < 1 or end <= start or len(self.levels[0][0]) == 0:
+            return np.zeros(max(width, 0), dtype=np.float32), np.zeros(max(width, 0), dtype=np.float32)
+        samples_per_column = (end - start) / width
+        level, bin_size = 0, self.base_size
+        while level + 1 < len(self.levels) and bin_size * self.factor <= samples_per_column:
+            level += 1
+            bin_size *= self.factor
+        mins, maxs = self.levels[level]
+        first = start // bin_size
+        last = min(len(mins), -(-end // bin_size))
+        edges = first + (np.arange(width) * (last - first) / width).astype(np.int64)
+        if last - first < width:
+            # Zoomed in further than the first level: columns repeat its bins
+            return mins[edges], maxs[edges]
+        return np.minimum.reduceat(mins[first:last], edges - first), np.maximum.reduceat(maxs[first:last],
+                                                                                        edges - first)
+
+    # Segments are kept in ms: they are computed at the config sample rate, the peaks of a streamed file are at the
+    # sample rate of the file
+    def set_segments(self, segments, sample_rate):
+        self.segments = [(1000 * int(start) / sample_rate, 1000 * int(end) / sample_rate) for start, end in segments]
+        return None
+
+    # Segment boundaries (start, end) in ms that overlap the [start_ms, end_ms] window
+    def get_segments(self, start_ms, end_ms):
+        return [(start, end) for start, end in self.segments if end >= start_ms and start <= end_ms]
+
+    def save(self, file_path, signature=None):
+        arrays = {f"{kind}_{i}": level[j] for i, level in enumerate(self.levels)
+                  for j, kind in enumerate(("mins", "maxs"))}
+        header = {"sample_rate": self.sample_rate, "length": self.length, "base_size": self.base_size,
+                  "factor": self.factor, "levels": len(self.levels), "segments": [list(s) for s in self.segments],
+                  "segment_unit": "ms", "signature": signature}
+        with open(file_path + ".tmp", "wb") as f:
+            np.savez(f, header=np.array(json.dumps(header)), **arrays)
+        os.replace(file_path + ".tmp", file_path)
+        return file_path
+
+    # Load a cached pyramid, None if it doesn't exist or if it was built from another version of the track
+    @classmethod
+    def load(cls, file_path, signature=None):
+        try:
+            with np.load(file_path) as data:
+                header = json.loads(str(data["header"]))
+                if signature is not None and header["signature"] != signature:
+                    return None
+                levels = [(data[f"mins_{i}"], data[f"maxs_{i}"]) for i in range(header["levels"])]
+        except (OSError, ValueError, KeyError):
+            return None
+        # Older caches kept the segments in samples of an unknown rate, they are dropped until the next split
+        segments = [tuple(s) for s in header["segments"]] if header.get("segment_unit") == "ms" else None
+        return cls(levels, header["sample_rate"], header["length"], base_size=header["base_size"],
+                   factor=header["factor"], segments=segments)
+
+
+# Cache file of the peaks of a track and the signature of the track it was built from
+def get_peak_cache(track_path, l_config: 'Configuration'):
+    stat = os.stat(track_path)
+    cache_path = get_cache_folder(l_config, character=True) + "/peaks_" + os.path.basename(track_path) + ".npz"
+    return cache_path, [stat.st_size, stat.st_mtime_ns]
+
+
+def save_peak_pyramid(track_path, peaks: 'PeakPyramid', l_log: 'Logs', l_config: 'Configuration'):
+    try:
+        cache_path, signature = get_peak_cache(track_path, l_config)
+        peaks.save(cache_path, signature=signature)
+    except Exception as e:
+        l_log.write_log(f"WARN: Can't cache the peaks of '{track_path}': {e}")
+    return None
+
+
+# Peaks of a track from the cache, built by streaming the track if they are missing or outdated
+def get_peak_pyramid(track_path, l_log: 'Logs', l_config: 'Configuration'):
+    cache_path, signature = get_peak_cache(track_path, l_config)
+    peaks = PeakPyramid.load(cache_path, signature=signature)
+    if peaks is None:
+        peaks = PeakPyramid.from_file(track_path, sample_rate=l_config.config["Static settings"]["sample_rate"])
+        save_peak_pyramid(track_path, peaks, l_log, l_config)
+    return peaks
+
+
+""" -----     SPLIT TUNER     ---------------------------------------------------------------------------------------"""
+
+
+# Settings of the split that can be tuned without decoding the track again
+SPLIT_SETTINGS = ("silent_volume_threshold", "silent_duration_threshold", "silence_padding", "minimal_segment_duration")
+
+# Values tried by suggest_split_settings, the padding is not swept: it moves the voice line boundaries only
+SPLIT_SWEEP_GRID = {"silent_volume_threshold": [-60, -55, -50, -45, -40, -35, -30, -25, -20],
+                    "silent_duration_threshold": [0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.2, 1.5],
+                    "minimal_segment_duration": [0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 1.0]}
+
+
+def get_split_settings(l_config: 'Configuration'):
+    return {setting: l_config.config["Settings"][setting] for setting in SPLIT_SETTINGS}
+
+
+# Split of a track evaluated again for new settings in milliseconds: the levels read by the split (the energy envelope
+# or the sampled levels, one value every split_thread samples) are computed once from the track with its pre effect,
+# an evaluation only detects the transitions for the threshold and merges them
+class SplitTuner:
+    def __init__(self, name, levels, energy, hysteresis, step, sample_rate, length, expected=None):
+        self.name = name
+        self.levels = levels
+        self.energy = energy
+        self.hysteresis = hysteresis
+        self.step = step
+        self.sr = sample_rate
+        self.length = length
+        self.expected = expected  # number of original lines of the group
+        self._transitions = {}
+
+    @classmethod
+    def from_audio(cls, audio_track: 'Audio', expected=None):
+        settings = audio_track.config.config["Advanced Settings"]
+        energy = settings.get("split_mode", "sample") == "energy"
+        levels = (audio_track.get_energy_envelope() if energy else
+                  sample_levels(audio_track.audio, audio_track.split_thread))
+        return cls(audio_track.name, levels, energy, settings.get("split_hysteresis", 6), audio_track.split_thread,
+                   audio_track.sr, len(audio_track.audio), expected=expected)
+
+    # Transitions for a threshold, kept for the next evaluations
+    def transitions(self, threshold_db):
+        if threshold_db not in self._transitions:
+            if self.energy:
+                transitions = envelope_transitions(self.levels, threshold_db, self.hysteresis, self.step, self.sr,
+                                                   self.length)
+            else:
+                transitions = sample_transitions(self.levels, threshold_db, self.step, self.sr, self.length)
+            self._transitions[threshold_db] = transitions
+        return self._transitions[threshold_db]
+
+    # Voice lines (start, end samples) of the track with the split settings, empty if nothing can be split
+    def segments(self, settings):
+        try:
+            return merge_segments(list(self.transitions(settings["silent_volume_threshold"])), self.length, self.sr,
+                                  settings["silent_duration_threshold"], settings["minimal_segment_duration"],
+                                  settings["silence_padding"])
+        except IndexError:
+            return []
+
+    def evaluate(self, settings):
+        count = len(self.segments(settings))
+        return {"track": self.name, "segments": count, "expected": self.expected,
+                "difference": count - self.expected if self.expected is not None else None}
+
+
+# Decode a dubbed track and apply its pre effect, like the split does, and build its tuner
+def build_split_tuner(track_path, l_log: 'Logs', l_config: 'Configuration'):
+    audio_track = Audio(path=track_path, logs=l_log, config=l_config)
+    pre_effect = l_config.config["Advanced Settings"]["pre_effect"]
+    if len(pre_effect) > 1:
+        audio_track.apply_effect(effect=pre_effect, scale=l_config.config["Advanced Settings"]["pre_effect_scale"])
+    tuner = SplitTuner.from_audio(audio_track)
+    audio_track.release()
+    return tuner
+
+
+# Sweep the grid of split settings over tracks whose number of original lines is known. The settings giving the
+# segment count closest to the original line count on all the tracks come first, the ties are ordered by their
+# distance to the current settings (in grid steps). Return [(total difference, settings)] of the best settings
+def suggest_split_settings(tuners, settings, grid=None, top=5):
+    grid = grid or SPLIT_SWEEP_GRID
+    tuners = [tuner for tuner in tuners if tuner.expected is not None]
+    # Without an expected number of lines every candidate scores the same, there is nothing to suggest
+    if len(tuners) == 0:
+        return []
+    names = list(grid)
+    results = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        candidate = dict(settings, **dict(zip(names, values)))
+        difference = sum(abs(len(tuner.segments(candidate)) - tuner.expected) for tuner in tuners)
+        distance = sum(abs(np.searchsorted(grid[name], candidate[name]) - np.searchsorted(grid[name], settings[name]))
+                       for name in names)
+        results.append((difference, distance, candidate))
+    results.sort(key=lambda result: result[:2])
+    return [(difference, candidate) for difference, distance, candidate in results[:top]]
+
+
+""" -----     ALIGNMENT     -----------------------------------------------------------------------------------------"""
+# Match the voice lines split from a dubbed track with the original lines of the group, to find the lines the actor
+# skipped or recorded twice before the files are numbered
+
+
+# Duration (seconds) and decimated energy envelope of a voice line, the envelope is normalized (zero mean, unit
+# variance) so lines recorded by different voices at different levels can be compared
+def line_features(file_path, l_log: 'Logs', l_config: 'Configuration', points=32):
+    audio = Audio(path=file_path, logs=l_log, config=l_config)
+    if audio.audio is None or len(audio.audio) == 0:
+        return 0, np.zeros(points)
+    envelope = np.maximum(audio.get_energy_envelope(), -60)
+    duration = audio.duration
+    audio.release()
+    envelope = np.interp(np.linspace(0, len(envelope) - 1, points), np.arange(len(envelope)), envelope)
+    return duration, (envelope - envelope.mean()) / max(envelope.std(), 1e-6)
+
+
+# Dynamic time warping distance of envelope pairs (arrays of pairs x points), the warping path stays in a band
+# around the diagonal. All the pairs are computed together, cell by cell
+def banded_dtw(a, b, band=4):
+    pairs, points = a.shape
+    cost = np.full((pairs, points + 1, points + 1), np.inf)
+    cost[:, 0, 0] = 0
+    for i in range(1, points + 1):
+        for j in range(max(1, i - band), min(points, i + band) + 1):
+            previous = np.minimum(np.minimum(cost[:, i - 1, j], cost[:, i, j - 1]), cost[:, i - 1, j - 1])
+            cost[:, i, j] = np.abs(a[:, i - 1] - b[:, j - 1]) + previous
+    return cost[:, points, points] / points
+
+
+# Align the voice lines of a group with its original lines (lists of (duration, envelope) in order)
+# Return a list of (voice line index or None, original index or None, cost): None on the voice line side is an
+# original line that was skipped, None on the original side is a voice line that matches nothing (extra take)
+def align_group(lines, originals, gap_cost=0.4, band=4, duration_weight=1.0):
+    n, m = len(lines), len(originals)
+    # Pairs far from the diagonal are never compared, the band grows with the difference of line numbers
+    line_band = band + abs(n - m)
+    pairs = [(i, j) for i in range(n) for j in range(m) if abs(i - j) <= line_band]
+    costs = np.full((n, m), np.inf)
+    if pairs:
+        distances = banded_dtw(np.array([lines[i][1] for i, j in pairs]),
+                               np.array([originals[j][1] for i, j in pairs]))
+        for (i, j), distance in zip(pairs, distances):
+            ratio = max(lines[i][0], 1e-3) / max(originals[j][0], 1e-3)
+            costs[i, j] = distance + duration_weight * abs(np.log(ratio))
+    # Edit distance: match a line with an original, or leave one of them alone for the gap cost
+    total = np.zeros((n + 1, m + 1))
+    total[1:, 0] = np.arange(1, n + 1) * gap_cost
+    total[0, 1:] = np.arange(1, m + 1) * gap_cost
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            total[i, j] = min(total[i - 1, j - 1] + costs[i - 1, j - 1], total[i - 1, j] + gap_cost,
+                              total[i, j - 1] + gap_cost)
+    alignment, i, j = [], n, m
+    while i > 0 or j > 0:
+        if i > 0 and j > 0 and total[i, j] == total[i - 1, j - 1] + costs[i - 1, j - 1]:
+            alignment.append((i - 1, j - 1, float(costs[i - 1, j - 1])))
+            i, j = i - 1, j - 1
+        elif i > 0 and total[i, j] == total[i - 1, j] + gap_cost:
+            alignment.append((i - 1, None, gap_cost))
+            i -= 1
+        else:
+            alignment.append((None, j - 1, gap_cost))
+            j -= 1
+    return alignment[::-1]
+
+
+# Index of a line from its file name ('Group_12.ogg' -> 12)
+def get_line_index(file_name, separator):
+    return int(os.path.splitext(file_name)[0].split(separator)[-1])
+
+
+# Propose the numbering of the split voice lines of the character from the original lines, nothing is renamed
+# Return a list of {group, file, original, target, cost} to review: file None is a skipped original line, target None
+# is a voice line that matches no original line
+def align_voice_lines(l_log: 'Logs', l_config: 'Configuration', progress: 'Progress' = None):
+    progress = progress or Progress()
+    vo_folder = l_config.config["Settings"]["voice_folder"] + "/" + l_config.config["Settings"][
+        "character_voice_folder"]
+    work_folder = (l_config.config["Settings"]["workspace_folder"] + "/" +
+                   l_config.config["Settings"]["character_voice_folder"] +
+                   l_config.config["Static settings"]["voice_lines"])
+    extension = "." + l_config.config["Static settings"]["audio_format"]
+    work_extension = "." + l_config.get_workspace_format()
+    separator = l_config.config["Static settings"]["name_separator"]
+    gap_cost = l_config.config["Advanced Settings"].get("alignment_gap_cost", 0.4)
+    o_files = FileManagement(path=vo_folder, logs=l_log, config=l_config).get_folder_content(file_filter=extension,
+                                                                                            raw=False)
+    vl_files = FileManagement(path=work_folder, logs=l_log, config=l_config).get_folder_content(
+        file_filter=work_extension, raw=False)
+    mapping = []
+    progress.start("align voice lines", len(vl_files))
+    # Decoding the lines takes most of the time, the files of a group are read in parallel
+    with ThreadPoolExecutor(max_workers=get_worker_count(l_config)) as executor:
+        for group in vl_files:
+            if group not in o_files:
+                l_log.write_log(f"WARN: {group} does not exist in the original voice folder, lines not aligned")
+                progress.advance(num_bytes=0)
+                continue
+            lines = sorted(vl_files[group], key=lambda f: get_line_index(f, separator))
+            originals = sorted(o_files[group], key=lambda f: get_line_index(f, separator))
+            features = list(executor.map(lambda path: line_features(path, l_log, l_config),
+                                         [work_folder + "/" + f for f in lines] +
+                                         [vo_folder + "/" + f for f in originals]))
+            alignment = align_group(features[:len(lines)], features[len(lines):], gap_cost=gap_cost)
+            for i, j, cost in alignment:
+                target = None
+                if i is not None and j is not None:
+                    target = f"{group}{separator}{get_line_index(originals[j], separator)}{work_extension}"
+                mapping.append({"group": group, "file": lines[i] if i is not None else None,
+                                "original": originals[j] if j is not None else None, "target": target,
+                                "cost": round(cost, 3)})
+            progress.advance(num_bytes=0)
+    return mapping
+
+
+# Rename the voice lines following a reviewed mapping, the lines that match nothing are moved to the unmatched folder
+# The names are changed in two passes so a line can take the name of another one. Return (renamed, moved)
+def apply_alignment(mapping, l_log: 'Logs', l_config: 'Configuration'):
+    character_folder = (l_config.config["Settings"]["workspace_folder"] + "/" +
+                        l_config.config["Settings"]["character_voice_folder"])
+    work_folder = character_folder + l_config.config["Static settings"]["voice_lines"]
+    unmatched_folder = character_folder + l_config.config["Static settings"]["unmatched_lines"]
+    moves = [(line["file"], line["target"]) for line in mapping
+             if line["file"] is not None and line["file"] != line["target"]]
+    renamed, moved = 0, 0
+    for file_name, target in moves:
+        os.replace(work_folder + "/" + file_name, work_folder + "/" + file_name + ".align")
+    for file_name, target in moves:
+        try:
+            if target is None:
+                os.makedirs(unmatched_folder, exist_ok=True)
+                shutil.move(work_folder + "/" + file_name + ".align", unmatched_folder + "/" + file_name)
+                moved += 1
+            else:
+                os.replace(work_folder + "/" + file_name + ".align", work_folder + "/" + target)
+                renamed += 1
+        except Exception as e:
+            l_log.write_log(f"WARN: Can't rename voice line '{file_name}': {e}")
+    # Skipped lines leave gaps in the numbering, check_names must keep them
+    save_json(get_cache_folder(l_config, character=True) + "/alignment.json",
+              {"files": sorted(os.listdir(work_folder))})
+    l_log.write_log(f"INFO: Alignment applied: {renamed} voice lines renamed, {moved} moved to {unmatched_folder}")
+    return renamed, moved
+
+
+# True if the voice lines are still numbered as the last applied alignment left them
+def is_aligned(folder_path, l_config: 'Configuration'):
+    state = load_json(get_cache_folder(l_config, character=True) + "/alignment.json", default={})
+    return os.path.isdir(folder_path) and sorted(os.listdir(folder_path)) == state.get("files")
+
+
+""" -----     SUBTITLES     -----------------------------------------------------------------------------------------"""
+
+
+# Subtitles of a character compiled once in a SQLite file, the index is rebuilt when the csv file changes
+class SubtitleIndex:
+    def __init__(self, subtitle_path, index_path, logs: 'Logs', separator=","):
+        self.subtitle_path = subtitle_path
+        self.index_path = index_path
+        self.log = logs
+        self.separator = separator
+        self.connection = None
+        self.full_text = False
+
+    # Open the index, compile it first if it doesn't exist or if the csv file has been modified
+    def open(self):
+        stat = os.stat(self.subtitle_path)
+        self.connection = sqlite3.connect(self.index_path)
+        try:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            signature = f"{stat.st_mtime_ns}:{stat.st_size}:{self.separator}"
+            row = self.connection.execute("SELECT value FROM meta WHERE key = 'signature'").fetchone()
+            if row is None or row[0] != signature:
+                self.compile(signature)
+            row = self.connection.execute("SELECT value FROM meta WHERE key = 'full_text'").fetchone()
+            self.full_text = row is not None and row[0] == "1"
+        except Exception:
+            # The caller falls back to the csv file, the connection is not kept
+            self.close()
+            raise
+        return self
+
+    def compile(self, signature):
+        start_ = time.time()
+        connection = self.connection
+        connection.execute("DROP TABLE IF EXISTS lines")
+        connection.execute("DROP TABLE IF EXISTS lines_fts")
+        connection.execute("CREATE TABLE lines (line_id TEXT PRIMARY KEY, line TEXT, context TEXT, parts TEXT)")
+        rows = {}
+        with open(self.subtitle_path, "r", encoding="utf-8", newline="") as f:
+            for parts in csv.reader(f, delimiter=self.separator):
+                if len(parts) == 0:
+                    continue
+                values = parts[1:]
+                line, context = "".join(values[0:-1]), values[-1] if values else ""
+                rows[parts[0]] = (parts[0], line, context, json.dumps(values))
+        connection.executemany("INSERT INTO lines VALUES (?, ?, ?, ?)", rows.values())
+        # Full text search if the SQLite build has FTS5, a slower LIKE search is used otherwise
+        full_text = True
+        try:
+            connection.execute("CREATE VIRTUAL TABLE lines_fts USING fts5(line_id UNINDEXED, line, context)")
+            connection.execute("INSERT INTO lines_fts SELECT line_id, line, context FROM lines")
+        except sqlite3.OperationalError:
+            full_text = False
+        connection.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                               [("signature", signature), ("full_text", "1" if full_text else "0")])
+        connection.commit()
+        self.log.write_log(f"INFO: Subtitle index compiled: {len(rows)} lines in {round(time.time() - start_, 3)} "
+                           f"seconds ({self.index_path})")
+        return None
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        return None
+
+    # Values of a line in the same form as get_subtitles: the line text parts followed by the context
+    def get(self, line_id, default=None):
+        row = self.connection.execute("SELECT parts FROM lines WHERE line_id = ?", (line_id,)).fetchone()
+        if row is None:
+            return default
+        return json.loads(row[0])
+
+    def __contains__(self, line_id):
+        return self.get(line_id) is not None
+
+    def __getitem__(self, line_id):
+        values = self.get(line_id)
+        if values is None:
+            raise KeyError(line_id)
+        return values
+
+    # Find the lines whose text or context contains the words, return a list of (line_id, line, context)
+    def search(self, text, limit=50):
+        words = text.split()
+        if len(words) == 0:
+            return []
+        if self.full_text:
+            query = " ".join('"' + word.replace('"', '""') + '"*' for word in words)
+            return self.connection.execute("SELECT line_id, line, context FROM lines_fts WHERE lines_fts MATCH ? "
+                                           "ORDER BY rank LIMIT ?", (query, limit)).fetchall()
+        conditions = " AND ".join("(line LIKE ? OR context LIKE ?)" for _ in words)
+        parameters = [value for word in words for value in (f"%{word}%", f"%{word}%")]
+        return self.connection.execute(f"SELECT line_id, line, context FROM lines WHERE {conditions} LIMIT ?",
+                                       parameters + [limit]).fetchall()
+
+
+# Open the subtitle index of the current character, get_subtitles is used if the index can't be built
+def load_subtitles(l_log: 'Logs', l_config: 'Configuration', separator=","):
+    subtitle_path = (l_config.config["Settings"]["voice_folder"] + "/" +
+                     l_config.config["Settings"]["character_voice_folder"] + "/" +
+                     l_config.config["Static settings"]["sub_file_name"])
+    try:
+        index_path = get_cache_folder(l_config, character=True) + "/subtitles.sqlite"
+        return SubtitleIndex(subtitle_path, index_path, logs=l_log, separator=separator).open()
+    except Exception as e:
+        l_log.write_log(f"WARN: Can't open the subtitle index, reading '{subtitle_path}' directly: {e}")
+        return get_subtitles(subtitle_path, separator)
+
+
+""" -----     CATALOG     -------------------------------------------------------------------------------------------"""
+
+
+# SQLite catalog of the game voice folder: character, group, index, duration, sample rate and channels of every voice
+# line, read from the file headers only. It is refreshed incrementally, only new or modified files are read again
+class VoiceCatalog:
+    def __init__(self, voice_folder, catalog_path, logs: 'Logs', config: 'Configuration', workers=8):
+        self.voice_folder = voice_folder
+        self.catalog_path = catalog_path
+        self.log = logs
+        self.extension = "." + config.config["Static settings"]["audio_format"]
+        self.separator = config.config["Static settings"]["name_separator"]
+        self.workers = workers
+        self.refresh_thread = None
+        self._lock = threading.Lock()
+        with self.connect() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            connection.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, character TEXT, "
+                               "line_group TEXT, line_index INTEGER, duration REAL, sample_rate INTEGER, "
+                               "channels INTEGER, size INTEGER, mtime INTEGER)")
+            connection.execute("CREATE INDEX IF NOT EXISTS files_character ON files (character, line_group)")
+            # The catalog only describes one voice folder
+            row = connection.execute("SELECT value FROM meta WHERE key = 'voice_folder'").fetchone()
+            if row is None or row[0] != voice_folder:
+                connection.execute("DELETE FROM files")
+                connection.execute("INSERT OR REPLACE INTO meta VALUES ('voice_folder', ?)", (voice_folder,))
+
+    # One connection per call, the catalog is read by the UI while a background thread refreshes it
+    @contextmanager
+    def connect(self):
+        connection = sqlite3.connect(self.catalog_path, timeout=30)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    # Voice lines of a character folder: (path, character, file name, size, mtime)
+    def scan_character(self, character):
+        files = []
+        with os.scandir(self.voice_folder + "/" + character) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(self.extension):
+                    stat = entry.stat()
+                    files.append((character + "/" + entry.name, character, entry.name, stat.st_size,
+                                  stat.st_mtime_ns))
+        return files
+
+    def read_info(self, file):
+        path, character, file_name, size, mtime = file
+        info = get_audio_info(self.voice_folder + "/" + path, l_log=self.log)
+        name = file_name[:-len(self.extension)]
+        group = ''.join(name.split(self.separator)[:-1])
+        try:
+            line_index = int(name.split(self.separator)[-1])
+        except ValueError:
+            line_index = None
+        if info is None:
+            return path, character, group, line_index, None, None, None, size, mtime
+        return path, character, group, line_index, info.duration, info.samplerate, info.channels, size, mtime
+
+    # Walk the voice folder (or only some characters) in parallel and update the catalog, return (updated, removed).
+    # Without blocking, return None if a refresh is already running instead of waiting for it
+    def refresh(self, characters=None, blocking=True):
+        if not self._lock.acquire(blocking=blocking):
+            return None
+        try:
+            start_ = time.time()
+            if characters is None:
+                characters = [entry.name for entry in os.scandir(self.voice_folder) if entry.is_dir()]
+                full = True
+            else:
+                characters = [c for c in characters if os.path.isdir(self.voice_folder + "/" + c)]
+                full = False
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                files = [file for found in executor.map(self.scan_character, characters) for file in found]
+                with self.connect() as connection:
+                    if full:
+                        known = connection.execute("SELECT path, size, mtime FROM files").fetchall()
+                    else:
+                        known = connection.execute(
+                            f"SELECT path, size, mtime FROM files WHERE character IN "
+                            f"({', '.join('?' for _ in characters)})", characters).fetchall()
+                known = {path: (size, mtime) for path, size, mtime in known}
+                changed = [file for file in files if known.get(file[0]) != (file[3], file[4])]
+                rows = list(executor.map(self.read_info, changed))
+            found = {file[0] for file in files}
+            removed = [(path,) for path in known if path not in found]
+            with self.connect() as connection:
+                connection.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                connection.executemany("DELETE FROM files WHERE path = ?", removed)
+            self.log.write_log(f"INFO: Voice catalog refreshed: {len(files)} files, {len(rows)} updated, "
+                               f"{len(removed)} removed in {round(time.time() - start_, 3)} seconds")
+            return len(rows), len(removed)
+        finally:
+            self._lock.release()
+
+    def refresh_in_background(self):
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                self.log.write_log(f"WARN: Can't refresh the voice catalog: {e}")
+        if self.refresh_thread is None or not self.refresh_thread.is_alive():
+            self.refresh_thread = threading.Thread(target=run, daemon=True)
+            self.refresh_thread.start()
+        return self.refresh_thread
+
+    def get_characters(self):
+        with self.connect() as connection:
+            rows = connection.execute("SELECT DISTINCT character FROM files ORDER BY character").fetchall()
+        return [row[0] for row in rows]
+
+    # Voice lines of a character by group, in the same form as FileManagement.get_folder_content(raw=False)
+    def get_groups(self, character):
+        groups = {}
+        with self.connect() as connection:
+            rows = connection.execute("SELECT line_group, path FROM files WHERE character = ? "
+                                      "ORDER BY line_group, line_index", (character,)).fetchall()
+        for group, path in rows:
+            if group != '':
+                groups.setdefault(group, []).append(path.split("/")[-1])
+        return groups
+
+    # Duration in seconds of the voice lines of a character, by file name
+    def get_durations(self, character):
+        with self.connect() as connection:
+            rows = connection.execute("SELECT path, duration FROM files WHERE character = ?", (character,)).fetchall()
+        return {path.split("/")[-1]: duration for path, duration in rows}
+
+
+_voice_catalog = None
+
+
+# Catalog of the configured voice folder, shared by the windows of the app
+def get_voice_catalog(l_log: 'Logs', l_config: 'Configuration', voice_folder=None):
+    global _voice_catalog
+    voice_folder = voice_folder or l_config.config["Settings"]["voice_folder"]
+    if _voice_catalog is None or _voice_catalog.voice_folder != voice_folder:
+        catalog_path = get_cache_folder(l_config) + "/voice_catalog.sqlite"
+        _voice_catalog = VoiceCatalog(voice_folder, catalog_path, logs=l_log, config=l_config)
+    return _voice_catalog
+
+
+""" -----     SESSION     -------------------------------------------------------------------------------------------"""
+
+
+# State of the main window kept between two launches of the app: the character, the selected tracks, the folder
+# listings and the results of the last pipeline steps. A listing is only reused while the modification time of its
+# folder is unchanged, adding, removing or renaming a file changes it
+class SessionState:
+    def __init__(self, session_path, logs: 'Logs', config: 'Configuration'):
+        self.session_path = session_path
+        self.log = logs
+        self.voice_folder = config.config["Settings"]["voice_folder"]
+        self.workspace_folder = config.config["Settings"]["workspace_folder"]
+        self.data = {"character": None, "listings": {}, "results": {}}
+        self._lock = threading.Lock()
+
+    # The session of other folders is ignored
+    def load(self):
+        data = load_json(self.session_path, default=None)
+        if (isinstance(data, dict) and data.get("voice_folder") == self.voice_folder and
+                data.get("workspace_folder") == self.workspace_folder):
+            self.data = data
+        return self
+
+    def save(self):
+        with self._lock:
+            self.data.update({"voice_folder": self.voice_folder, "workspace_folder": self.workspace_folder})
+            try:
+                os.replace(save_json(self.session_path + ".tmp", self.data), self.session_path)
+            except OSError as e:
+                self.log.write_log(f"WARN: Can't save the session: {e}")
+        return None
+
+    # The main window can be reopened directly if the last session used this character and its workspace still exists
+    def is_resumable(self, character):
+        return (self.data.get("character") == character and
+                os.path.isdir(self.workspace_folder + "/" + character))
+
+    # Start a session on a character, the state of the previous character is dropped
+    def set_character(self, character):
+        if self.data.get("character") != character:
+            self.data = {"character": character, "listings": {}, "results": {}}
+            self.save()
+        return None
+
+    # Content stored for a folder, None if it was never stored or if the folder changed since
+    def get_listing(self, name, folder_path):
+        listing = self.data["listings"].get(name)
+        try:
+            if listing is not None and listing["mtime"] == os.stat(folder_path).st_mtime_ns:
+                return listing["content"]
+        except OSError:
+            pass
+        return None
+
+    def set_listing(self, name, folder_path, content):
+        try:
+            self.data["listings"][name] = {"mtime": os.stat(folder_path).st_mtime_ns, "content": content}
+            self.save()
+        except OSError as e:
+            self.log.write_log(f"WARN: Can't store the listing of '{folder_path}': {e}")
+        return None
+
+    # Results of the last run of a pipeline step
+    def set_result(self, step, result):
+        self.data["results"][step] = dict(result, time=time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()))
+        self.save()
+        return None
+
+    def get_results(self):
+        return self.data["results"]
+
+
+_session_state = None
+
+
+# Session of the configured folders, loaded once per launch
+def get_session_state(l_log: 'Logs', l_config: 'Configuration'):
+    global _session_state
+    if (_session_state is None or _session_state.voice_folder != l_config.config["Settings"]["voice_folder"] or
+            _session_state.workspace_folder != l_config.config["Settings"]["workspace_folder"]):
+        _session_state = SessionState(get_cache_folder(l_config) + "/session.json", logs=l_log,
+                                      config=l_config).load()
+    return _session_state
+
+
+""" -----     PLAYBACK     ------------------------------------------------------------------------------------------"""
+
+
+# Small LRU cache of decoded 16 bits PCM buffers, lines can be decoded ahead of time in background threads
+class AudioCache:
+    def __init__(self, logs: 'Logs', capacity=8, workers=2):
+        self.log = logs
+        self.capacity = capacity
+        self._buffers = OrderedDict()  # path: (pcm bytes, sample rate, channels)
+        self._pending = {}  # path: future of the decoding
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    @staticmethod
+    def decode(path):
+        data, sample_rate = sf.read(path, dtype='int16', always_2d=True)
+        return data.tobytes(), sample_rate, data.shape[1]
+
+    def _store(self, path, buffer):
+        with self._lock:
+            self._pending.pop(path, None)
+            self._buffers[path] = buffer
+            self._buffers.move_to_end(path)
+            while len(self._buffers) > self.capacity:
+                self._buffers.popitem(last=False)
+        return buffer
+
+    def _decode_and_store(self, path):
+        return self._store(path, self.decode(path))
+
+    # Start decoding the files in background if they are not already cached
+    def prefetch(self, paths):
+        with self._lock:
+            for path in paths:
+                if path in self._buffers or path in self._pending or not os.path.exists(path):
+                    continue
+                self._pending[path] = self._executor.submit(self._decode_and_store, path)
+        return None
+
+    # Get the buffer of a file, waiting for the prefetch or decoding it now if needed
+    def get(self, path):
+        with self._lock:
+            if path in self._buffers:
+                self._buffers.move_to_end(path)
+                return self._buffers[path]
+            future = self._pending.get(path)
+        try:
+            if future is not None:
+                return future.result()
+            return self._decode_and_store(path)
+        except Exception as e:
+            with self._lock:
+                self._pending.pop(path, None)
+            self.log.write_log(f"WARN: Can't decode '{path}' for playback: {e}")
+            return None
+
+    def clear(self):
+        with self._lock:
+            self._buffers.clear()
+        return None
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.clear()
+        return None
+
+
 """ -----     RECORDER     ------------------------------------------------------------------------------------------"""
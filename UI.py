@@ -1,11 +1,10 @@
 """ -----     IMPORTS     -------------------------------------------------------------------------------------------"""
-import shutil
 import time
 
 from PyQt6.QtCore import *
 from PyQt6.QtGui import *
 from PyQt6.QtWidgets import *
-from PyQt6.QtMultimedia import QMediaPlayer, QAudioOutput
+from PyQt6.QtMultimedia import QAudioFormat, QAudioSink
 from matplotlib.style.core import available
 
 from Class_functions import *
@@ -26,6 +25,53 @@ def apply_style(app):
     app.setStyleSheet(style)
 
 
+# The voice catalog is only used once the workspace exists, the folders are read directly otherwise
+def get_catalog(voice_folder=None):
+    try:
+        if os.path.isdir(config.workspace_folder):
+            return get_voice_catalog(log, config, voice_folder=voice_folder)
+    except Exception as e:
+        log.write_log(f"WARN: Can't open the voice catalog: {e}")
+    return None
+
+
+# Characters of the voice folder, from the voice catalog when it has already been built
+def get_characters(voice_folder):
+    catalog = get_catalog(voice_folder)
+    if catalog is not None:
+        characters = catalog.get_characters()
+        if len(characters) > 0:
+            return characters
+        catalog.refresh_in_background()
+    return [d for d in os.listdir(voice_folder) if os.path.isdir(os.path.join(voice_folder, d))]
+
+
+# Voice line groups of a character from the voice catalog (the character folder is refreshed first). The folder is
+# listed directly while the catalog is being refreshed, the UI doesn't wait for the whole voice folder to be indexed
+def get_voice_groups(character):
+    catalog = get_catalog()
+    if catalog is not None:
+        try:
+            if catalog.refresh(characters=[character], blocking=False) is not None:
+                return catalog.get_groups(character)
+        except Exception as e:
+            log.write_log(f"WARN: Can't read the voice catalog: {e}")
+    vo_files = FileManagement(config.VO_folder + "/" + character, logs=log, config=config)
+    return vo_files.get_folder_content(file_filter="." + config.config["Static settings"]["audio_format"], raw=False)
+
+
+# First window of the app: the main window of the last session when it can be restored, the setup windows otherwise
+def get_start_window(status):
+    try:
+        if config.config["Settings"]["restore_session"] and os.path.isdir(config.workspace_folder):
+            if get_session_state(log, config).is_resumable(config.character):
+                log.write_log(f"INFO: Session of {config.character} restored")
+                return MainWindow(config.VO_folder, config.workspace_folder)
+    except Exception as e:
+        log.write_log(f"WARN: Can't restore the last session: {e}")
+    return IntroWindow(status=status)
+
+
 # First window with title and "Next" button
 class IntroWindow(QWidget):
     def __init__(self, status="#498dbf"):
@@ -196,8 +242,7 @@ class FolderWindow(QWidget):
         # Load characters from the voice folder
         voice_folder = self.voice_input.text()
         if os.path.exists(voice_folder):
-            characters = [d for d in os.listdir(voice_folder) if os.path.isdir(os.path.join(voice_folder, d))]
-            char_list.addItems(characters)
+            char_list.addItems(get_characters(voice_folder))
 
         window_description = QLabel("Select a character to dub:", self.selection_window)
         window_description.setFont(QFont("Arial", 12))
@@ -248,10 +293,18 @@ class MainWindow(QWidget):
         self.dubbed_tracks = config.config["Static settings"]["dubbed_tracks"]
         self.voice_lines = config.config["Static settings"]["voice_lines"]
         self.extension = "." + config.config["Static settings"]["audio_format"]
+        self.work_extension = "." + config.get_workspace_format()
         self.setWindowTitle("VoiceLineToolKit - Main Menu")
         self.setGeometry(200, 200, 1280, 720)  # 16:9 aspect ratio
-        self.vo_fld_content = None
-        self.selected_tracks = []
+        self.blank_tracks_folder = self.workspace_char_folder + config.config["Static settings"]["blank_tracks"]
+        # The selection and the game folder listing of the last session are reused while their folders are unchanged
+        self.session = get_session_state(log, config)
+        self.session.set_character(self.character)
+        self.vo_fld_content = self.session.get_listing("voice_groups", self.voice_folder + "/" + self.character)
+        self.selected_tracks = self.session.get_listing("selected_tracks", self.blank_tracks_folder) or []
+        self.watcher = None
+        self.watch_notifier = WatchNotifier()
+        self.watch_notifier.processed.connect(self.tracks_processed)
         self.init_ui()
 
     def init_ui(self):
@@ -267,6 +320,13 @@ class MainWindow(QWidget):
         description_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         description_label.setWordWrap(True)
 
+        # Results of the last steps, also from the previous session
+        self.session_label = QLabel(self)
+        self.session_label.setFont(QFont("Arial", 11))
+        self.session_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.session_label.setWordWrap(True)
+        self.update_session_label()
+
         # Buttons with descriptions
         import_button = QPushButton("1: Import Audio Files", self)
         import_button.setFont(QFont("Arial", 16))
@@ -322,6 +382,27 @@ class MainWindow(QWidget):
         settings_button.setFont(QFont("Arial", 12))
         settings_button.clicked.connect(self.open_settings)
 
+        # Waveform button
+        waveform_button = QPushButton("Track waveforms", self)
+        waveform_button.setFont(QFont("Arial", 12))
+        waveform_button.clicked.connect(self.open_waveforms)
+
+        # Split tuner button
+        tuner_button = QPushButton("Split tuner", self)
+        tuner_button.setFont(QFont("Arial", 12))
+        tuner_button.clicked.connect(self.open_split_tuner)
+
+        # Alignment button
+        align_button = QPushButton("Align voice lines", self)
+        align_button.setFont(QFont("Arial", 12))
+        align_button.clicked.connect(self.align_lines)
+
+        # Watch button
+        self.watch_button = QPushButton("Watch dubbed tracks", self)
+        self.watch_button.setFont(QFont("Arial", 12))
+        self.watch_button.setCheckable(True)
+        self.watch_button.toggled.connect(self.toggle_watch)
+
         # subtitle button
         log_button = QPushButton("Log file", self)
         log_button.setFont(QFont("Arial", 12))
@@ -338,6 +419,7 @@ class MainWindow(QWidget):
         layout = QVBoxLayout()
         layout.addWidget(title_label)
         layout.addWidget(description_label)
+        layout.addWidget(self.session_label)
 
         button_layout1 = QHBoxLayout()
         button_layout1.addWidget(import_button)
@@ -379,6 +461,10 @@ class MainWindow(QWidget):
         # Add the Subtitle button
         button_layout5 = QHBoxLayout()
         button_layout5.addStretch()
+        button_layout5.addWidget(self.watch_button)
+        button_layout5.addWidget(align_button)
+        button_layout5.addWidget(tuner_button)
+        button_layout5.addWidget(waveform_button)
         button_layout5.addWidget(log_button)
         layout.addLayout(button_layout5)
         self.debug_ui(update=True)
@@ -398,9 +484,7 @@ class MainWindow(QWidget):
         # Load characters from the voice folder
         try:
             if os.path.exists(self.voice_folder):
-                characters = [d for d in os.listdir(self.voice_folder) if
-                              os.path.isdir(os.path.join(self.voice_folder, d))]
-                character_selection.addItems(characters)
+                character_selection.addItems(get_characters(self.voice_folder))
         except Exception as e:
             log.write_log(f"WARN: Can't get characters from game files: {e}")
         # Checkbox in the secondary window
@@ -408,6 +492,8 @@ class MainWindow(QWidget):
         da_checkbox = QCheckBox("Delete all **", dialog)
         # Button to confirm and close the dialog
         confirm_button = QPushButton("Confirm", dialog)
+        # Button to restore the game files as they were before a previous push
+        restore_button = QPushButton("Restore a previous push", dialog)
         # Label to show checkbox status
         status_label = QLabel("* Disabled: Code will push only the files that are existing in the game files\n"
                               "** Disabled: Code will delete only the dubbed voice lines in the game's folder",
@@ -446,6 +532,13 @@ class MainWindow(QWidget):
             return None
 
         confirm_button.clicked.connect(confirm_selection)
+
+        def restore_selection():
+            self.restore_snapshot(character=character_selection.currentText())
+            dialog.accept()
+            return None
+
+        restore_button.clicked.connect(restore_selection)
         # Layout for the dialog
         layout = QVBoxLayout()
         layout.addWidget(QLabel("Select a character where to push:", dialog))
@@ -453,6 +546,7 @@ class MainWindow(QWidget):
         layout.addWidget(pa_checkbox)
         layout.addWidget(da_checkbox)
         layout.addWidget(confirm_button)
+        layout.addWidget(restore_button)
         layout.addWidget(status_label)
         dialog.setLayout(layout)
         # Execute the dialog modal (blocks interaction with main window)
@@ -467,6 +561,7 @@ class MainWindow(QWidget):
         self.dubbed_tracks = config.config["Static settings"]["dubbed_tracks"]
         self.voice_lines = config.config["Static settings"]["voice_lines"]
         self.extension = "." + config.config["Static settings"]["audio_format"]
+        self.work_extension = "." + config.get_workspace_format()
         log.write_log(f"INFO: Config values have been updated")
 
     def debug_ui(self, update=False):
@@ -476,14 +571,35 @@ class MainWindow(QWidget):
         self.debug_button.setStyleSheet(f"background-color: {status}; color: white")
         return None
 
+    # Voice line groups of the game files, the listing of the session is reused while the folder is unchanged
+    def load_voice_groups(self):
+        vo_fld_path = config.VO_folder + "/" + config.character
+        groups = self.session.get_listing("voice_groups", vo_fld_path)
+        if groups is None:
+            groups = get_voice_groups(config.character)
+            if len(groups) > 0:
+                self.session.set_listing("voice_groups", vo_fld_path, groups)
+        return groups
+
+    # Store the result of a pipeline step in the session and show it
+    def save_result(self, step, **result):
+        self.session.set_result(step, result)
+        self.update_session_label()
+        return None
+
+    def update_session_label(self):
+        results = self.session.get_results()
+        lines = [f"Character: {self.character}"]
+        lines += [f"Last {step}: {result['message']} ({result['time']})" for step, result in results.items()]
+        self.session_label.setText("\n".join(lines))
+        return None
+
     def import_original_vl(self):
         log.write_log("\n\nINFO: Called function: Import Audio files")
         try:
             # Get voice lines groups from the game files
             path_vo = config.VO_folder + "/" + config.character
-            vo_files = FileManagement(path_vo, logs=log, config=config)
-            extension = "." + config.config["Static settings"]["audio_format"]
-            self.vo_fld_content = vo_files.get_folder_content(file_filter=extension, raw=False)
+            self.vo_fld_content = self.load_voice_groups()
             file_list = list(self.vo_fld_content.keys())
             # Check if original voice lines can be found and stop import if not
             if len(file_list) == 0:
@@ -499,20 +615,14 @@ class MainWindow(QWidget):
             if len(self.selected_tracks) == 0:
                 log.write_log(f"INFO: No selected items for import")
                 return None
-                # Clear blank tracks folder
-            try:
-                clear_directory(config.workspace_folder + "/" + config.character + config.blank_tracks)
-            except Exception as e:
-                log.write_log(f"WARN: Can't clear blank tracks directory: {e}")
+            # Sync the blank tracks folder with the selection
             blank_tracks_folder = config.workspace_folder + "/" + config.character + config.blank_tracks
-            saved_file, bad_file = 0, 0
-            for file_name in self.selected_tracks:
-                file = Audio(path="None", logs=log, config=config)
-                success = file.save(output_folder=blank_tracks_folder, segments='empty', name=file_name)
-                saved_file += 1 if success > 0 else 0
-                bad_file += 1 if success == 0 else 0
+            saved_file, removed_file, bad_file = sync_blank_tracks(blank_tracks_folder, self.selected_tracks,
+                                                                   l_log=log, l_config=config)
+            self.session.set_listing("selected_tracks", blank_tracks_folder, self.selected_tracks)
             end_ = time.time()
-            message = f'Import completed, {saved_file} files imported in {round(end_ - start_, 3)} seconds.'
+            message = (f'Import completed, {saved_file} files imported and {removed_file} removed '
+                       f'in {round(end_ - start_, 3)} seconds.')
             if bad_file > 0:
                 message += f"\n{bad_file} files could not be imported. Check logs for more details."
             log.write_log(f"INFO: {message}")
@@ -547,15 +657,14 @@ class MainWindow(QWidget):
                 else:
                     for track in blank_tracks_list:
                         self.selected_tracks.append("".join(track.split(".")[:-1]))
+                    self.session.set_listing("selected_tracks", blank_tracks_folder_path, self.selected_tracks)
             except Exception as e:
                 log.write_log("WARN: Exception occurred while launching dub assistant files: ", e)
         if self.vo_fld_content is None:
             log.write_log(f"INFO: Retrieving files from the game files")
             try:
                 vo_fld_path = config.VO_folder + "/" + config.character
-                vo_fld = FileManagement(vo_fld_path, logs=log, config=config)
-                files_extension = "." + config.config["Static settings"]["audio_format"]
-                vo_file_dict = vo_fld.get_folder_content(raw=False, file_filter=files_extension)
+                vo_file_dict = self.load_voice_groups()
                 vo_file_list = list(vo_file_dict.keys())
                 if len(vo_file_list) == 0:
                     log.write_log(f"WARN: Folder '{vo_fld_path}' seems empty, dub assistant can't start")
@@ -584,8 +693,7 @@ class MainWindow(QWidget):
         try:
             self.update_config()
             stime = time.time()
-            saved_number, pre_effect, pre_effect_scale = (0, config.config["Advanced Settings"]["pre_effect"],
-                                                          config.config["Advanced Settings"]["pre_effect_scale"])
+            saved_number = 0
             workspace = FileManagement(self.workspace_char_folder + self.dubbed_tracks, logs=log, config=config)
             files = workspace.get_folder_content(file_filter='.ogg', raw=True)
             if len(files) == 0:
@@ -596,33 +704,34 @@ class MainWindow(QWidget):
                                         f"Split can't start: check logs for more details."
                                         f"\nMake sure you exported the dubbed tracks in the right folder.")
                 return None
-            for file in files:
+            pool = get_worker_pool(config)
+            progress_window = ProgressWindow("Splitting tracks", self)
+            try:
+                futures = map_split_jobs(pool, [f'{self.workspace_char_folder}{self.dubbed_tracks}/{file}'
+                                                for file in files], self.workspace_char_folder + self.voice_lines,
+                                         config, cancel_token=progress_window.cancel_token)
+                wait_jobs(futures, progress_window.progress, "split tracks")
+            except OperationCancelled:
+                log.write_log("INFO: Splitting was canceled by the user.")
+            finally:
+                progress_window.close()
+            # After a cancel the jobs still running are not waited for, the UI stays responsive
+            for future, file in futures.items():
                 try:
-                    audio_track = Audio(path=f'{self.workspace_char_folder}{self.dubbed_tracks}/{file}', logs=log,
-                                        config=config)
-                    ok = True
-                    if len(audio_track.audio) < audio_track.sr * 0.5:
-                        log.write_log(
-                            f"WARN: file '{file}' seems empty ({len(audio_track.audio) / audio_track.sr}). File "
-                            f"skipped. ")
-                        ok = False
-                    if len(pre_effect) > 1 and ok:
-                        audio_track.apply_effect(effect=pre_effect, scale=pre_effect_scale)
-                    if ok:
-                        segments = audio_track.split_audio()
-                        saved_number += audio_track.save(output_folder=self.workspace_char_folder + self.voice_lines,
-                                                         segments=segments,
-                                                         name='auto')
-                except Exception as e:
-                    log.write_log(f"WARN: Can't read {file}: ", e)
+                    if future.done() and not future.cancelled():
+                        saved_number += future.result()
+                except OperationCancelled:
                     pass
+                except Exception as e:
+                    log.write_log(f"WARN: Can't read {file}: {e}")
             etime = time.time()
             message = f"Splitting completed in {round(etime - stime, 1)}s, {saved_number} files saved"
             log.write_log(f"INFO: {message}")
+            self.save_result("split", message=message, files=saved_number, tracks=len(files))
             QMessageBox.information(self, "Information", message)
             self.debug_ui(update=True)
         except Exception as e:
-            log.write_log("WARN: Exception occurred while splitting files: ", e)
+            log.write_log(f"WARN: Exception occurred while splitting files: {e}")
             QMessageBox.information(self, "Warning",
                                     f"Splitting couldn't finish: check log")
         return
@@ -647,12 +756,23 @@ class MainWindow(QWidget):
                                         f"\nMake sure you clicked on the split function before trying to adjust the "
                                         f"volumes.")
                 return None
-            if double_check:
-                check_audio_files(work_folder, l_log=log, l_config=config, auto_del=True)
-            num = adjust_volume(log=log, l_config=config)
+            # The lines are measured then adjusted by the worker pool, the progress window can cancel both phases
+            progress_window = ProgressWindow("Adjusting volumes", self)
+            try:
+                if double_check:
+                    check_audio_files(work_folder, l_log=log, l_config=config, auto_del=True,
+                                      progress=progress_window.progress)
+                num = adjust_volume(l_log=log, l_config=config, progress=progress_window.progress,
+                                    pool=get_worker_pool(config))
+            except OperationCancelled:
+                log.write_log("INFO: Volume adjustment was canceled by the user.")
+                num = progress_window.progress.done if progress_window.progress.stage == "adjust volume" else 0
+            finally:
+                progress_window.close()
             end_ = time.time()
             message = f"{num} adjusted volume in {round(end_ - start_)} seconds"
             log.write_log(f"INFO: {message}")
+            self.save_result("adjust", message=message, files=num)
             QMessageBox.information(self, "Information", message)
             self.debug_ui(update=True)
         except Exception as e:
@@ -668,7 +788,7 @@ class MainWindow(QWidget):
             # Get dubbed voice lines
             folder = FileManagement(path=self.workspace_char_folder + "/" + self.voice_lines, logs=log,
                                     config=config)
-            file_list = list(folder.get_folder_content(raw=True, file_filter=self.extension))
+            file_list = list(folder.get_folder_content(raw=True, file_filter=self.work_extension))
             if len(file_list) == 0:
                 log.write_log(f"WARN: Folder '{self.workspace_char_folder + self.voice_lines}' seems empty, "
                               f"enhancement has been stopped."
@@ -697,23 +817,54 @@ class MainWindow(QWidget):
                     QMessageBox.information(self, "Information", "No effects selected. Enhancement canceled.")
                     self.debug_ui(update=True)
                     return None
-                for file_name in file_list:
-                    file_path = self.workspace_char_folder + self.voice_lines + "/" + file_name
-                    file = Audio(path=file_path, logs=log, config=config)
-                    # Apply effect
-                    for effect in selected_effects:
-                        file.apply_effect(effect=effect)
-                    file.save(output_folder=file.folder, name=file.name)
-                    num += 1
+                pool = get_worker_pool(config)
+                # Files enhanced by an interrupted run are not enhanced twice
+                journal = JobJournal("enhance", {"effects": selected_effects}, log, config).open()
+                file_paths = [self.workspace_char_folder + self.voice_lines + "/" + f for f in file_list]
+                futures = map_enhance_jobs(pool, [p for p in file_paths if not journal.is_done(p)], selected_effects,
+                                           config, keep_temp=True)
+
+                # Replace the voice line with its enhanced version as soon as its job ends
+                handled = set()
+
+                def commit(future, file_path):
+                    nonlocal num
+                    handled.add(file_path)
+                    try:
+                        for path, temp_path in job_results(file_path, future):
+                            if temp_path is not None:
+                                journal.commit(path, temp_path)
+                                num += 1
+                    except Exception as e:
+                        log.write_log(f"WARN: Can't enhance {file_path}: {e}")
+
+                completed = False
+                progress_window = ProgressWindow("Enhancing voice lines", self)
+                try:
+                    wait_jobs(futures, progress_window.progress, "enhance voice lines", on_done=commit)
+                    completed = True
+                except OperationCancelled:
+                    log.write_log("INFO: Enhancement was canceled by the user.")
+                    # The jobs that were already running are kept
+                    for future, file_path in futures.items():
+                        if not future.cancelled() and file_path not in handled:
+                            commit(future, file_path)
+                finally:
+                    progress_window.close()
+                    if completed:
+                        journal.finish()
+                    else:
+                        journal.close()
                 end_ = time.time()
                 message = f"{num} files enhanced in {round(end_ - start_, 1)} seconds"
                 log.write_log(f"INFO: {message}: ")
+                self.save_result("enhance", message=message, files=num, effects=selected_effects)
                 QMessageBox.information(self, "Information", message)
                 self.debug_ui(update=True)
             else:
                 log.write_log("INFO: Enhancement process was canceled by the user.")
         except Exception as e:
-            log.write_log("WARN: Exception occurred while enhancing audio files: ", e)
+            log.write_log(f"WARN: Exception occurred while enhancing audio files: {e}")
             QMessageBox.warning(self, "Error", "Exception occurred !")
         self.debug_ui(update=True)
         return
@@ -721,8 +872,10 @@ class MainWindow(QWidget):
     def push_audio_files(self, character="Default", push_all=True, delete_all=False):
         log.write_log("\n\nINFO: Called function: Push audio files")
         try:
+            # Gaps left by an applied alignment are skipped lines, they are not renumbered
+            aligned = is_aligned(self.workspace_char_folder + self.voice_lines, config)
             missing_files = check_names(folder_path=self.workspace_char_folder + self.voice_lines,
-                                        l_config=config, l_log=log)
+                                        l_config=config, l_log=log, auto_correction=not aligned)
             if len(missing_files) == 0:
                 log.write_log(f"INFO: File naming complete, everything looks good.")
             else:
@@ -735,49 +888,25 @@ class MainWindow(QWidget):
             start_ = time.time()
             if character == "Default":
                 character = self.character
-            vl_folder_path = self.workspace_char_folder + self.voice_lines
-            vo_folder_path = self.voice_folder + "/" + character
-            check_names(folder_path=vl_folder_path, l_config=config, l_log=log)
-            vl_fld = FileManagement(path=vl_folder_path, logs=log, config=config)
-            vo_fld = FileManagement(path=vo_folder_path, logs=log, config=config)
-            vl_files = vl_fld.get_folder_content(raw=False, file_filter=self.extension)
-            if len(vl_files) == 0:
-                log.write_log(f"WARN: {vl_folder_path} seems empty, stopping push"
-                              f"\n     Make sure you have split the dubbed tracks before trying to push")
+            result = push_voice_lines(character, l_log=log, l_config=config, push_all=push_all,
+                                      delete_all=delete_all)
+            if result is None:
                 QMessageBox.warning(self, "Error", f"Push can't start, "
                                                    f"check logs for more details"
                                                    f"\nMake sure you clicked on the split function before trying to "
                                                    f"push your voice lines.")
                 return None
-            vo_files = vo_fld.get_folder_content(raw=False, file_filter=self.extension)
-            num, wrong, done = 0, [], False
-            if delete_all:
-                done = clear_directory(vo_folder_path)
-                if done is not True:
-                    log.write_log(f"WARN: {vo_folder_path} can't be cleared: {done}")
-            for vl_base_name in vl_files:
-                if vl_base_name in vo_files:
-                    if not delete_all and done != True:
-                        for file_name in vo_files[vl_base_name]:  # Remove the original files
-                            os.remove(vo_folder_path + "/" + file_name)
-                    for file_name in vl_files[vl_base_name]:  # Add the new files
-                        shutil.copy(vl_folder_path + "/" + file_name, vo_folder_path + "/" + file_name)
-                        num += 1
-                else:
-                    for file_name in vl_files[vl_base_name]:  # count number of wrong files
-                        wrong.append(file_name)
-                        if push_all:
-                            shutil.copy(vl_folder_path + "/" + file_name, vo_folder_path + "/" + file_name)
-                            num += 1
+            num, wrong, group_number = result
             end_ = time.time()
             add = ""
-            if num == len(vl_files):
+            if num == group_number:
                 add = "(all) "
             message = f'{num} {add}files were pushed in the game files in {round(end_ - start_, 2)} seconds.'
             if len(wrong) > 0:
                 message += f' {len(wrong)} files seem to not exist in the game files, check log for more details.'
             log.write_log(f"INFO: {message}.\n "
                           f"      Not original files: {', '.join(wrong)}")
+            self.save_result("push", message=message, files=num, not_original=wrong)
             QMessageBox.information(self, "Information", message)
             self.debug_ui(update=True)
         except Exception as e:
@@ -785,6 +914,31 @@ class MainWindow(QWidget):
             QMessageBox.warning(self, "Error", f"Exception occurred ! {e}")
         return
 
+    def restore_snapshot(self, character):
+        log.write_log("\n\nINFO: Called function: Restore snapshot")
+        try:
+            self.update_config()
+            store = SnapshotStore(log, config)
+            snapshots = store.list_snapshots(character)
+            if len(snapshots) == 0:
+                QMessageBox.information(self, "Information", f"No previous push found for {character}.")
+                return None
+            snapshot_id, ok = QInputDialog.getItem(self, "Restore",
+                                                   f"Restore the game files of {character} as they were before "
+                                                   f"the push of:", snapshots, 0, False)
+            if not ok:
+                return None
+            start_ = time.time()
+            num = store.restore(character, snapshot_id, self.voice_folder + "/" + character)
+            message = (f"Game files of {character} restored to {snapshot_id}, {num} files copied in "
+                       f"{round(time.time() - start_, 2)} seconds.")
+            QMessageBox.information(self, "Information", message)
+            self.debug_ui(update=True)
+        except Exception as e:
+            log.write_log(f"WARN: could not restore the snapshot: {e}")
+            QMessageBox.warning(self, "Error", f"Exception occurred ! {e}")
+        return None
+
     def open_settings(self):
         log.write_log("INFO: Called function: Open Settings")
         # Open the config.ini file with the default application
@@ -797,6 +951,120 @@ class MainWindow(QWidget):
             QMessageBox.warning(self, "Error", f"Can't open settings. {e}")
         return
 
+    def align_lines(self):
+        log.write_log("\n\nINFO: Called function: Align voice lines")
+        try:
+            self.update_config()
+            progress_window = ProgressWindow("Aligning voice lines", self)
+            try:
+                mapping = align_voice_lines(l_log=log, l_config=config, progress=progress_window.progress)
+            finally:
+                progress_window.close()
+            # Only the lines that would change are reviewed
+            changes = [line for line in mapping if line["file"] is None or line["file"] != line["target"]]
+            if len(changes) == 0:
+                QMessageBox.information(self, "Information", "The voice lines already match the original lines.")
+                return None
+            review_window = AlignmentWindow(changes)
+            if review_window.exec() == QDialog.DialogCode.Accepted:
+                renamed, moved = apply_alignment(mapping, l_log=log, l_config=config)
+                QMessageBox.information(self, "Information", f"{renamed} voice lines renamed, {moved} moved to "
+                                                             f"{config.config['Static settings']['unmatched_lines']}")
+            else:
+                log.write_log("INFO: Alignment was canceled by the user.")
+        except OperationCancelled:
+            log.write_log("INFO: Alignment was canceled by the user.")
+        except Exception as e:
+            log.write_log(f"WARN: Exception occurred while aligning voice lines: {e}")
+            QMessageBox.warning(self, "Error", "Exception occurred !")
+        self.debug_ui(update=True)
+        return None
+
+    def open_waveforms(self):
+        log.write_log("INFO: Called function: Track waveforms")
+        self.update_config()
+        folder = FileManagement(self.workspace_char_folder + self.dubbed_tracks, logs=log, config=config)
+        tracks = list(folder.get_folder_content(file_filter=self.extension, raw=True))
+        if len(tracks) == 0:
+            QMessageBox.information(self, "Information", "No dubbed track in the workspace yet.")
+            return None
+        self.waveform_window = WaveformWindow(self.workspace_char_folder + self.dubbed_tracks, tracks)
+        self.waveform_window.show()
+        return None
+
+    # The dubbed tracks are decoded and filtered once by the workers, the split settings are then tuned on them
+    def open_split_tuner(self):
+        log.write_log("INFO: Called function: Split tuner")
+        self.update_config()
+        folder = FileManagement(self.workspace_char_folder + self.dubbed_tracks, logs=log, config=config)
+        tracks = list(folder.get_folder_content(file_filter=self.extension, raw=True))
+        if len(tracks) == 0:
+            QMessageBox.information(self, "Information", "No dubbed track in the workspace yet.")
+            return None
+        try:
+            groups = self.load_voice_groups()
+            pool = get_worker_pool(config)
+            futures = pool.map_files(build_split_tuner, [folder.path + "/" + track for track in tracks],
+                                     l_config=config, steps=["split", config.config["Advanced Settings"]["pre_effect"]])
+            progress_window = ProgressWindow("Reading dubbed tracks", self)
+            try:
+                wait_jobs(futures, progress_window.progress, "read tracks")
+            finally:
+                progress_window.close()
+            tuners = []
+            for future, track_path in futures.items():
+                try:
+                    tuner = future.result()
+                    tuner.expected = len(groups[tuner.name]) if tuner.name in groups else None
+                    tuners.append(tuner)
+                except Exception as e:
+                    log.write_log(f"WARN: Can't read {track_path}: {e}")
+            if len(tuners) == 0:
+                QMessageBox.warning(self, "Error", "The dubbed tracks can't be read, check logs")
+                return None
+            self.tuner_window = SplitTunerWindow(folder.path, sorted(tuners, key=lambda tuner: tuner.name))
+            self.tuner_window.show()
+        except OperationCancelled:
+            log.write_log("INFO: Split tuner was canceled by the user.")
+        except Exception as e:
+            log.write_log(f"WARN: Exception occurred while opening the split tuner: {e}")
+            QMessageBox.warning(self, "Error", "Exception occurred !")
+        self.debug_ui(update=True)
+        return None
+
+    # Process the dubbed tracks exported while the watch is on, in the background
+    def toggle_watch(self, checked):
+        if checked:
+            log.write_log("INFO: Called function: Watch dubbed tracks")
+            self.update_config()
+            try:
+                # The watcher works on its own copy of the settings
+                self.watcher = watch_dubbed_tracks(log, config.for_character(self.character),
+                                                   on_processed=self.watch_notifier.processed.emit)
+                self.watch_button.setText("Watching dubbed tracks...")
+            except Exception as e:
+                log.write_log(f"WARN: Can't watch the dubbed tracks: {e}")
+                QMessageBox.warning(self, "Error", f"Can't watch the dubbed tracks: {e}")
+                self.watch_button.setChecked(False)
+        elif self.watcher is not None:
+            self.watcher.stop(join=False)
+            self.watcher = None
+            self.watch_button.setText("Watch dubbed tracks")
+        self.debug_ui(update=True)
+        return None
+
+    def tracks_processed(self, report):
+        if self.watcher is not None:
+            self.watch_button.setText(f"Watching: {report['split']} lines from {', '.join(report['tracks'])}")
+        self.save_result("watch", message=f"{report['split']} lines from {', '.join(report['tracks'])}", **report)
+        self.debug_ui(update=True)
+        return None
+
+    def closeEvent(self, event):
+        if self.watcher is not None:
+            self.watcher.stop(join=False)
+        super().closeEvent(event)
+
     def open_logs(self):
         self.update_config()
         log.write_log("INFO: Called function: Open log file")
@@ -810,6 +1078,66 @@ class MainWindow(QWidget):
         return
 
 
+# Carries the reports of the watcher thread to the UI thread
+class WatchNotifier(QObject):
+    processed = pyqtSignal(dict)
+
+
+# Modal progress window of a long operation, the cancel button stops it before its next file
+class ProgressWindow(QProgressDialog):
+    def __init__(self, title, parent=None):
+        super().__init__(title, "Cancel", 0, 0, parent)
+        self.setWindowTitle(title)
+        self.setWindowModality(Qt.WindowModality.WindowModal)
+        self.setMinimumDuration(500)
+        self.setAutoReset(False)
+        self.setAutoClose(False)
+        self.cancel_token = CancelToken()
+        self.canceled.connect(self.cancel_token.cancel)
+        self.progress = Progress(callback=self.update_progress, cancel_token=self.cancel_token)
+
+    def update_progress(self, event):
+        self.setMaximum(max(event["total"], 1))
+        self.setValue(min(event["done"], event["total"]))
+        self.setLabelText(f"{event['stage'].capitalize()}: {event['done']}/{event['total']} files"
+                          f" ({event['bytes_per_second'] / 1e6:.1f} MB/s)")
+        QApplication.processEvents()
+
+
+# Review of the voice lines an alignment would rename, nothing is renamed before it is accepted
+class AlignmentWindow(QDialog):
+    def __init__(self, changes):
+        super().__init__()
+        self.setWindowTitle("Review alignment")
+        self.setGeometry(200, 200, 800, 600)
+        layout = QVBoxLayout()
+        info_label = QLabel("Voice lines that don't match their original line. Lines without a new name are moved "
+                            "out of the voice lines, original lines without a voice line were skipped.", self)
+        info_label.setFont(QFont("Arial", 12))
+        info_label.setWordWrap(True)
+        layout.addWidget(info_label)
+
+        table = QTableWidget(len(changes), 5, self)
+        table.setHorizontalHeaderLabels(["Group", "Voice line", "Original line", "New name", "Cost"])
+        for row, line in enumerate(changes):
+            for column, key in enumerate(["group", "file", "original", "target", "cost"]):
+                value = line[key]
+                table.setItem(row, column, QTableWidgetItem("-" if value is None else str(value)))
+        table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        table.resizeColumnsToContents()
+        layout.addWidget(table)
+
+        button_layout = QHBoxLayout()
+        apply_button = QPushButton("Apply")
+        apply_button.clicked.connect(self.accept)
+        cancel_button = QPushButton("Cancel")
+        cancel_button.clicked.connect(self.reject)
+        button_layout.addWidget(apply_button)
+        button_layout.addWidget(cancel_button)
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+
 # Window with checkboxes list
 class SelectionWindow(QDialog):
     def __init__(self, items, additional_text=None):
@@ -896,8 +1224,10 @@ class AudioWindow(QWidget):
     def __init__(self, audio_dict):
         super().__init__()
         # get the subtitle data
-        sub_path = config.VO_folder + "/" + config.character + "/" + config.config["Static settings"]["sub_file_name"]
-        self.subtitles = get_subtitles(sub_path, ",")
+        self.subtitles = load_subtitles(log, config, ",")
+        # Duration of the original lines, the target length of the dubbed lines
+        catalog = get_catalog()
+        self.durations = catalog.get_durations(config.character) if catalog is not None else {}
         self.audio_ext = "." + config.config["Static settings"]["audio_format"]
 
         self.setWindowTitle("Audio Player")
@@ -908,6 +1238,16 @@ class AudioWindow(QWidget):
         self.current_key_index = 0  # Index for current key in the dictionary
         self.current_audio_index = 0  # Index for current audio in the list of the key
         self.keys = list(audio_dict.keys())  # List of dictionary keys
+        # Position of each line in the dictionary, to jump to a line found by the search
+        self.line_positions = {}
+        for key_index, key in enumerate(self.keys):
+            for audio_index, audio_name in enumerate(audio_dict[key]):
+                self.line_positions[audio_name[:-len(self.audio_ext)]] = (key_index, audio_index)
+
+        # In-app playback, the current line and its neighbours are decoded ahead of time
+        self.audio_cache = AudioCache(log, capacity=8)
+        self.audio_sink = None
+        self.audio_buffer = None
 
         # Labels and buttons
         font = QFont("Arial", 14)
@@ -923,6 +1263,11 @@ class AudioWindow(QWidget):
         self.previous_button.clicked.connect(self.previous_key)
         self.cycle_button = QPushButton("Cycle", self)
         self.cycle_button.clicked.connect(self.cycle_audio)
+        self.search_input = QLineEdit(self)
+        self.search_input.setPlaceholderText("Search a line by its text...")
+        self.search_input.returnPressed.connect(self.search_line)
+        self.search_button = QPushButton("Search", self)
+        self.search_button.clicked.connect(self.search_line)
 
         # Layout setup
         button_layout = QHBoxLayout()
@@ -930,26 +1275,111 @@ class AudioWindow(QWidget):
         button_layout.addWidget(self.cycle_button)
         button_layout.addWidget(self.next_button)
 
+        search_layout = QHBoxLayout()
+        search_layout.addWidget(self.search_input)
+        search_layout.addWidget(self.search_button)
+
         layout = QVBoxLayout()
+        layout.addLayout(search_layout)
         layout.addWidget(self.text_label)
         layout.addWidget(self.info_label)
         layout.addWidget(self.listen_button)
         layout.addLayout(button_layout)
 
         self.setLayout(layout)
+        self.prefetch_neighbours()
+
+    def closeEvent(self, event):
+        if self.audio_sink is not None:
+            self.audio_sink.stop()
+        self.audio_cache.close()
+        if isinstance(self.subtitles, SubtitleIndex):
+            self.subtitles.close()
+        super().closeEvent(event)
+
+    # Search the subtitles and jump to the selected line
+    def search_line(self):
+        try:
+            text = self.search_input.text()
+            if isinstance(self.subtitles, SubtitleIndex):
+                results = self.subtitles.search(text, limit=200)
+            elif isinstance(self.subtitles, dict):
+                results = [(line_id, "".join(values[0:-1]), values[-1] if values else "")
+                           for line_id, values in self.subtitles.items()
+                           if text.lower() in " ".join(values).lower()]
+            else:
+                results = []
+            results = [result for result in results if result[0] in self.line_positions]
+            if len(results) == 0:
+                self.info_label.setText(f"No line found for '{text}'")
+                return None
+            selected = results[0][0]
+            if len(results) > 1:
+                items = [f"{line_id}: {line}" for line_id, line, context in results]
+                item, ok = QInputDialog.getItem(self, "Search results", f"{len(results)} lines found:", items,
+                                                0, False)
+                if not ok:
+                    return None
+                selected = results[items.index(item)][0]
+            self.current_key_index, self.current_audio_index = self.line_positions[selected]
+            self.update_text_label()
+            self.play_audio()
+            self.prefetch_neighbours()
+        except Exception as e:
+            log.write_log(f"WARN: Dub assist, can't search the subtitles: {e}")
+        return None
+
+    def get_audio_path(self, key_index, audio_index=0):
+        key = self.keys[key_index % len(self.keys)]
+        audio_files = self.audio_dict[key]
+        return config.VO_folder + "/" + config.character + "/" + audio_files[audio_index % len(audio_files)]
+
+    # Decode the current line, the next one in the group and the next / previous groups in background
+    def prefetch_neighbours(self):
+        try:
+            if len(self.keys) == 0:
+                return None
+            self.audio_cache.prefetch([self.get_audio_path(self.current_key_index, self.current_audio_index),
+                                       self.get_audio_path(self.current_key_index, self.current_audio_index + 1),
+                                       self.get_audio_path(self.current_key_index + 1),
+                                       self.get_audio_path(self.current_key_index - 1)])
+        except Exception as e:
+            log.write_log(f"WARN: Dub assist, can't prefetch audio files: {e}")
+        return None
+
+    # Play a decoded PCM buffer from the cache, the previous playback is stopped
+    def play_buffer(self, buffer):
+        pcm, sample_rate, channels = buffer
+        if self.audio_sink is not None:
+            self.audio_sink.stop()
+            self.audio_sink.deleteLater()
+            self.audio_buffer.deleteLater()
+        audio_format = QAudioFormat()
+        audio_format.setSampleRate(sample_rate)
+        audio_format.setChannelCount(channels)
+        audio_format.setSampleFormat(QAudioFormat.SampleFormat.Int16)
+        self.audio_buffer = QBuffer(self)
+        self.audio_buffer.setData(QByteArray(pcm))
+        self.audio_buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        self.audio_sink = QAudioSink(audio_format, self)
+        self.audio_sink.start(self.audio_buffer)
+        return None
 
     def update_text_label(self):
         try:
             current_key = self.keys[self.current_key_index]
             current_audio = self.audio_dict[current_key][self.current_audio_index][:-len(self.audio_ext)]
             add = ""
-            if isinstance(self.subtitles, dict):
+            if isinstance(self.subtitles, (dict, SubtitleIndex)):
                 if current_audio in self.subtitles:
                     print(self.subtitles[current_audio])
                     add = (f'\nLine: {"".join(self.subtitles[current_audio][0:-1])}'
                            f'\nContext: {self.subtitles[current_audio][-1]}')
                 else:
                     add = "\nNo info for this line"
+            duration = self.durations.get(self.audio_dict[current_key][self.current_audio_index])
+            if duration is not None:
+                add = f"\nDuration: {duration:.2f} s" + add
             self.text_label.setText(f"Group: {current_key}\nAudio: {current_audio}\n" + add)
         except Exception as e:
             log.write_log("WARN: Dub assist, can't update text label: ", e)
@@ -963,8 +1393,11 @@ class AudioWindow(QWidget):
 
             if os.path.exists(current_path):  # Ensure the file exists
                 try:
-                    # Open the audio file using the default player (e.g., Windows Media Player)
-                    os.startfile(current_path)
+                    buffer = self.audio_cache.get(current_path)
+                    if buffer is None:
+                        raise ValueError("the file can't be decoded")
+                    self.play_buffer(buffer)
+                    self.info_label.setText(f"Playing {current_audio}")
                 except Exception as e:
                     self.info_label.setText(f"Error playing audio: {e}")
             else:
@@ -981,6 +1414,8 @@ class AudioWindow(QWidget):
 
             self.current_audio_index = 0  # Reset audio index when switching keys
             self.update_text_label()
+            self.play_audio()
+            self.prefetch_neighbours()
         except Exception as e:
             log.write_log("WARN: Can't get to the next track group: ", e)
 
@@ -993,6 +1428,8 @@ class AudioWindow(QWidget):
 
             self.current_audio_index = 0  # Reset audio index when switching keys
             self.update_text_label()
+            self.play_audio()
+            self.prefetch_neighbours()
         except Exception as e:
             log.write_log("WARN: Can't get to the previous track group: ", e)
 
@@ -1005,5 +1442,222 @@ class AudioWindow(QWidget):
                 self.current_audio_index = 0  # Loop back to the first audio
 
             self.update_text_label()
+            self.play_audio()
+            self.prefetch_neighbours()
         except Exception as e:
             log.write_log("WARN: Can't cycle through the line names: ", e)
+
+
+# Waveform of a track drawn from its peak pyramid, with the split segments overlaid
+# Mouse wheel: zoom around the cursor, drag: move in the track
+class WaveformView(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.peaks = None
+        self.start_ms, self.end_ms = 0.0, 1.0
+        self.drag_x = None
+        self.setMinimumHeight(200)
+
+    def set_peaks(self, peaks):
+        self.peaks = peaks
+        self.start_ms, self.end_ms = 0.0, max(peaks.duration, 1.0)
+        self.update()
+
+    def set_range(self, start_ms, end_ms):
+        duration = max(self.peaks.duration, 1.0)
+        span = min(max(end_ms - start_ms, 1.0), duration)
+        self.start_ms = min(max(start_ms, 0.0), duration - span)
+        self.end_ms = self.start_ms + span
+        self.update()
+        if isinstance(self.parent(), WaveformWindow):
+            self.parent().update_range_label()
+
+    def wheelEvent(self, event):
+        if self.peaks is None:
+            return None
+        cursor_ms = self.start_ms + (self.end_ms - self.start_ms) * event.position().x() / max(self.width(), 1)
+        zoom = 0.8 if event.angleDelta().y() > 0 else 1.25
+        self.set_range(cursor_ms - (cursor_ms - self.start_ms) * zoom, cursor_ms + (self.end_ms - cursor_ms) * zoom)
+
+    def mousePressEvent(self, event):
+        self.drag_x = event.position().x()
+
+    def mouseMoveEvent(self, event):
+        if self.peaks is None or self.drag_x is None:
+            return None
+        shift = (self.drag_x - event.position().x()) * (self.end_ms - self.start_ms) / max(self.width(), 1)
+        self.drag_x = event.position().x()
+        self.set_range(self.start_ms + shift, self.end_ms + shift)
+
+    def mouseReleaseEvent(self, event):
+        self.drag_x = None
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor("#1f4f75"))
+        if self.peaks is None:
+            return None
+        width, height = self.width(), self.height()
+        span = max(self.end_ms - self.start_ms, 1e-9)
+        # Segments (voice lines) first, the waveform is drawn over them
+        for start, end in self.peaks.get_segments(self.start_ms, self.end_ms):
+            x_start = int((start - self.start_ms) / span * width)
+            x_end = int((end - self.start_ms) / span * width)
+            painter.fillRect(x_start, 0, max(x_end - x_start, 1), height, QColor(73, 141, 191, 90))
+            painter.setPen(QColor("#fa781b"))
+            painter.drawLine(x_start, 0, x_start, height)
+            painter.drawLine(x_end, 0, x_end, height)
+        mins, maxs = self.peaks.get_peaks(self.start_ms, self.end_ms, width)
+        middle = height / 2
+        painter.setPen(QColor("#ffffff"))
+        for x in range(len(mins)):
+            painter.drawLine(x, int(middle - maxs[x] * middle), x, int(middle - mins[x] * middle))
+        painter.end()
+
+
+class WaveformWindow(QWidget):
+    def __init__(self, tracks_folder, tracks):
+        super().__init__()
+        self.setWindowTitle("Track waveforms")
+        self.setGeometry(250, 250, 1200, 400)
+        self.tracks_folder = tracks_folder
+
+        self.track_selection = QComboBox(self)
+        self.track_selection.addItems(tracks)
+        self.track_selection.currentTextChanged.connect(self.load_track)
+        self.waveform = WaveformView(self)
+        self.range_label = QLabel(self)
+        reset_button = QPushButton("Whole track", self)
+        reset_button.clicked.connect(lambda: self.waveform.set_range(0, self.waveform.peaks.duration)
+                                     if self.waveform.peaks is not None else None)
+
+        top_layout = QHBoxLayout()
+        top_layout.addWidget(self.track_selection)
+        top_layout.addWidget(reset_button)
+        layout = QVBoxLayout()
+        layout.addLayout(top_layout)
+        layout.addWidget(self.waveform)
+        layout.addWidget(self.range_label)
+        self.setLayout(layout)
+        self.load_track(tracks[0])
+
+    def load_track(self, track):
+        try:
+            peaks = get_peak_pyramid(self.tracks_folder + "/" + track, log, config)
+            self.waveform.set_peaks(peaks)
+            self.update_range_label()
+            if len(peaks.segments) == 0:
+                self.range_label.setText(self.range_label.text() + "  (not split yet)")
+        except Exception as e:
+            log.write_log(f"WARN: Can't draw the waveform of '{track}': {e}")
+        return None
+
+    def update_range_label(self):
+        peaks = self.waveform.peaks
+        segments = len(peaks.get_segments(self.waveform.start_ms, self.waveform.end_ms))
+        self.range_label.setText(f"{self.waveform.start_ms:.0f} ms - {self.waveform.end_ms:.0f} ms "
+                                 f"/ {peaks.duration:.0f} ms, {segments} voice lines shown")
+        return None
+
+
+# Split settings tuned on the dubbed tracks, the voice lines of the selected track are drawn on its waveform
+class SplitTunerWindow(QWidget):
+    def __init__(self, tracks_folder, tuners):
+        super().__init__()
+        self.setWindowTitle("Split tuner")
+        self.setGeometry(250, 250, 1200, 500)
+        self.tracks_folder = tracks_folder
+        self.tuners = {tuner.name: tuner for tuner in tuners}
+
+        self.track_selection = QComboBox(self)
+        self.track_selection.addItems(list(self.tuners))
+        self.track_selection.currentTextChanged.connect(self.load_track)
+        self.waveform = WaveformView(self)
+        self.track_label = QLabel(self)
+        self.total_label = QLabel(self)
+
+        settings_layout = QHBoxLayout()
+        self.inputs = {}
+        ranges = {"silent_volume_threshold": (-80, 0, 1), "silent_duration_threshold": (0, 5, 0.05),
+                  "silence_padding": (0, 2, 0.05), "minimal_segment_duration": (0, 5, 0.05)}
+        for setting, value in get_split_settings(config).items():
+            minimum, maximum, step = ranges[setting]
+            spin_box = QDoubleSpinBox(self)
+            spin_box.setRange(minimum, maximum)
+            spin_box.setSingleStep(step)
+            spin_box.setDecimals(2)
+            spin_box.setValue(value)
+            spin_box.valueChanged.connect(self.evaluate)
+            settings_layout.addWidget(QLabel(setting, self))
+            settings_layout.addWidget(spin_box)
+            self.inputs[setting] = spin_box
+
+        suggest_button = QPushButton("Suggest settings", self)
+        suggest_button.clicked.connect(self.suggest)
+        save_button = QPushButton("Save settings", self)
+        save_button.clicked.connect(self.save_settings)
+
+        top_layout = QHBoxLayout()
+        top_layout.addWidget(self.track_selection)
+        top_layout.addWidget(suggest_button)
+        top_layout.addWidget(save_button)
+        layout = QVBoxLayout()
+        layout.addLayout(top_layout)
+        layout.addLayout(settings_layout)
+        layout.addWidget(self.waveform)
+        layout.addWidget(self.track_label)
+        layout.addWidget(self.total_label)
+        self.setLayout(layout)
+        self.load_track(self.track_selection.currentText())
+
+    def get_settings(self):
+        return {setting: spin_box.value() for setting, spin_box in self.inputs.items()}
+
+    def load_track(self, name):
+        try:
+            tracks = [track for track in os.listdir(self.tracks_folder) if os.path.splitext(track)[0] == name]
+            self.waveform.set_peaks(get_peak_pyramid(self.tracks_folder + "/" + tracks[0], log, config))
+        except Exception as e:
+            log.write_log(f"WARN: Can't draw the waveform of '{name}': {e}")
+        self.evaluate()
+        return None
+
+    # Split of the selected track and of all the tracks with the current settings
+    def evaluate(self):
+        settings = self.get_settings()
+        tuner = self.tuners.get(self.track_selection.currentText())
+        if tuner is not None:
+            segments = tuner.segments(settings)
+            expected = f"{tuner.expected} original lines" if tuner.expected is not None else "no original group"
+            self.track_label.setText(f"{tuner.name}: {len(segments)} voice lines / {expected}")
+            if self.waveform.peaks is not None:
+                self.waveform.peaks.set_segments(segments, tuner.sr)
+                self.waveform.update()
+        results = [tuner.evaluate(settings) for tuner in self.tuners.values()]
+        known = [result for result in results if result["expected"] is not None]
+        self.total_label.setText(f"All tracks: {sum(result['segments'] for result in results)} voice lines, "
+                                 f"{sum(result['difference'] != 0 for result in known)} of {len(known)} tracks "
+                                 f"don't match their original line count")
+        return None
+
+    def suggest(self):
+        suggestions = suggest_split_settings(list(self.tuners.values()), self.get_settings())
+        if len(suggestions) == 0:
+            log.write_log("INFO: No split settings to suggest, no track matches an original line group")
+            QMessageBox.information(self, "Information", "No track matches an original line group, the split "
+                                                         "settings can't be compared with the original lines")
+            return None
+        difference, settings = suggestions[0]
+        for setting, value in settings.items():
+            self.inputs[setting].blockSignals(True)
+            self.inputs[setting].setValue(value)
+            self.inputs[setting].blockSignals(False)
+        self.evaluate()
+        log.write_log(f"INFO: Split settings suggested: {settings}, {difference} lines off the original count")
+        return None
+
+    def save_settings(self):
+        for setting, value in self.get_settings().items():
+            config.edit("Settings", setting, round(value, 2))
+        QMessageBox.information(self, "Information", "Split settings saved, they are used by the next split.")
+        return None
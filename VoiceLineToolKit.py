@@ -1,29 +1,43 @@
+import multiprocessing
+import os
 import sys
 
-from UI import *
-from Class_functions import Logs, Configuration
-# INIT APP
-log = Logs()
-config = Configuration(logs=log)
-config.import_settings()
-try:
-    if config.config["Settings"]["reset_logs"]:
-        log.clear_logs()
-except Exception as e:
-    log.write_log(f"WARN: Checking reset_logs settings:  {e}")
-
-log.create_instance()
-config = Configuration(logs=log)
-config.import_settings()
-initial_status = set_debug_status(log)
+# The worker processes re-import this module (and frozen builds re-run it), only the main process starts the app
+is_worker = multiprocessing.current_process().name != 'MainProcess' or '--multiprocessing-fork' in sys.argv
+
+if not is_worker:
+    from UI import *
+    from Class_functions import Logs, Configuration
+    # INIT APP
+    log = Logs()
+    config = Configuration(logs=log)
+    config.import_settings()
+    try:
+        if config.config["Settings"]["reset_logs"]:
+            log.clear_logs()
+    except Exception as e:
+        log.write_log(f"WARN: Checking reset_logs settings:  {e}")
+
+    log.create_instance()
+    config = Configuration(logs=log)
+    config.import_settings()
+    initial_status = set_debug_status(log)
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
 
     apply_style(app)
 
-    intro_window = IntroWindow(status=initial_status)
-    intro_window.show()
+    # Start the worker processes in the background, they are ready when the first job is submitted
+    get_worker_pool(config).start(warm=True)
+    # Index the game voice folder in the background, the windows read the catalog instead of the folders
+    if os.path.isdir(config.VO_folder) and os.path.isdir(config.workspace_folder):
+        get_voice_catalog(log, config).refresh_in_background()
+
+    # The main window is reopened directly on the character of the last session
+    start_window = get_start_window(initial_status)
+    start_window.show()
 
     app.exec()
     sys.exit()
@@ -0,0 +1,80 @@
+""" -----     IMPORTS     -------------------------------------------------------------------------------------------"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from Class_functions import BatchScheduler, Configuration, Logs, watch_dubbed_tracks
+
+""" -----     MAIN     ----------------------------------------------------------------------------------------------"""
+
+
+# Characters of the workspace that have dubbed tracks waiting to be processed
+def find_characters(l_config):
+    characters = []
+    workspace = l_config.workspace_folder
+    if os.path.isdir(workspace):
+        for character in sorted(os.listdir(workspace)):
+            dubbed_folder = workspace + "/" + character + l_config.dubbed_tracks
+            if os.path.isdir(dubbed_folder) and len(os.listdir(dubbed_folder)) > 0:
+                characters.append(character)
+    return characters
+
+
+# Watch the dubbed tracks of the characters until Ctrl+C
+def watch(characters, log, config, effects=None):
+    watchers = [watch_dubbed_tracks(log, config.for_character(character), effects=effects)
+                for character in characters]
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        log.write_log("INFO: Watch interrupted by the user")
+    finally:
+        for watcher in watchers:
+            watcher.stop()
+    return 0
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Run the split -> adjust -> enhance -> push pipeline for several "
+                                                 "characters with the settings of config.ini")
+    parser.add_argument("characters", nargs="*",
+                        help="Character voice folders to process (default: every workspace character with dubbed "
+                             "tracks)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes shared by all the characters (default: 'workers' setting)")
+    parser.add_argument("--effects", default=None,
+                        help="Effects applied by the enhance step, '' to skip it (default: 'pipeline_effects' setting)")
+    parser.add_argument("--push", action="store_true", help="Push the voice lines in the game files")
+    parser.add_argument("--push-all", action="store_true",
+                        help="Also push the voice lines that don't exist in the game files")
+    parser.add_argument("--delete-all", action="store_true",
+                        help="Delete all the original voice lines of the character before pushing")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and process the dubbed tracks exported in the workspace (new or modified "
+                             "tracks only) until interrupted")
+    args = parser.parse_args(args)
+
+    log = Logs()
+    log.create_instance()
+    config = Configuration(logs=log)
+    config.import_settings()
+    if args.watch:
+        return watch(args.characters or [config.character], log, config, effects=args.effects)
+    characters = args.characters or find_characters(config)
+    if len(characters) == 0:
+        log.write_log("WARN: Batch, no character to process")
+        return 1
+    scheduler = BatchScheduler(characters, log, config, workers=args.workers, effects=args.effects, push=args.push,
+                               push_all=args.push_all, delete_all=args.delete_all)
+    reports = scheduler.run()
+    report_path = scheduler.save_reports()
+    print(json.dumps(reports, indent=2))
+    log.write_log(f"INFO: Batch completed, report saved in {report_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
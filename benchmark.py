@@ -0,0 +1,259 @@
+""" -----     IMPORTS     -------------------------------------------------------------------------------------------"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import noisereduce as nr
+import numpy as np
+
+from Class_functions import (ENCODER_PROFILES, Audio, Configuration, FileManagement, Logs, SplitTuner,
+                             get_split_settings, reduce_noise_batch, write_audio)
+
+""" -----     SYNTHETIC AUDIO     -----------------------------------------------------------------------------------"""
+
+
+# Generate a deterministic track that looks like a dubbed take: speech-like bursts, silences, noise floor and clipping
+def generate_audio(duration, sample_rate=44100, seed=0):
+    rng = np.random.default_rng(seed)
+    num_samples = int(duration * sample_rate)
+    audio = np.zeros(num_samples, dtype=np.float32)
+    position = int(rng.uniform(0.1, 0.5) * sample_rate)
+    while position < num_samples:
+        # Voiced burst: a few harmonics with a slow pitch drift and a syllable-like envelope
+        burst_length = min(int(rng.uniform(0.3, 2.0) * sample_rate), num_samples - position)
+        t = np.arange(burst_length) / sample_rate
+        pitch = rng.uniform(90, 220) * (1 + 0.05 * np.sin(2 * np.pi * rng.uniform(0.5, 2) * t))
+        phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+        burst = sum(np.sin(h * phase) / h for h in range(1, 6))
+        syllables = 0.5 * (1 - np.cos(2 * np.pi * rng.uniform(2, 5) * t))
+        envelope = np.minimum(1, np.minimum(t, t[::-1]) / 0.02) * (0.3 + 0.7 * syllables)
+        burst = burst * envelope * rng.uniform(0.1, 0.6)
+        # Some bursts are recorded too loud and clip
+        if rng.random() < 0.2:
+            burst = np.clip(burst * 4, -0.99, 0.99)
+        audio[position:position + burst_length] = burst
+        position += burst_length + int(rng.uniform(0.2, 1.5) * sample_rate)
+    # Noise floor around -60 dB
+    audio += (rng.standard_normal(num_samples) * 1e-3).astype(np.float32)
+    return audio
+
+
+""" -----     KERNELS     -------------------------------------------------------------------------------------------"""
+
+
+# Time a function, the setup is run before each repetition and is not timed (the first run is a warm-up)
+def time_kernel(function, setup=None, repeat=5):
+    timings = []
+    for _ in range(repeat + 1):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings[1:])
+
+
+def bench_audio_kernels(l_config, l_log, durations, repeat, kernel_filter=None):
+    results = {}
+    sample_rate = l_config.config["Static settings"]["sample_rate"]
+    effects = l_config.config["Static settings"]["all_effect"].split(" ")
+    for duration in durations:
+        signal = generate_audio(duration, sample_rate=sample_rate, seed=int(duration * 1000))
+        audio = Audio(path="None", config=l_config, logs=l_log)
+        audio.get_split_thread()
+
+        def reset():
+            audio.audio = signal.copy()
+
+        def split_with_mode(mode):
+            l_config.config["Advanced Settings"]["split_mode"] = mode
+            return audio.split_audio()
+
+        # Evaluation of new split settings once the levels of the track are computed (transitions not cached)
+        def tune_split(tuner):
+            tuner._transitions.clear()
+            return tuner.segments(split_settings)
+
+        reset()
+        split_settings = get_split_settings(l_config)
+        tuner = SplitTuner.from_audio(audio)
+
+        kernels = {
+            "split_audio": lambda: split_with_mode("sample"),
+            "split_audio.energy": lambda: split_with_mode("energy"),
+            "split_tuner.segments": lambda: tune_split(tuner),
+            "calculate_rms": lambda: audio.calculate_rms(isolate=False),
+            "calculate_rms_isolate": lambda: audio.calculate_rms(isolate=True),
+            "isolate_high_amp": audio.isolate_high_amp,
+        }
+        for effect in effects:
+            kernels[f"apply_effect.{effect}"] = lambda effect=effect: audio.apply_effect(effect=effect)
+        # Chain of shaping effects, applied through one lookup table
+        kernels["apply_effect.shaping"] = lambda: audio.apply_effect(effect="sinus softclip gain desaturation")
+        for name, kernel in kernels.items():
+            if kernel_filter and not any(k in name for k in kernel_filter):
+                continue
+            seconds = time_kernel(kernel, setup=reset, repeat=repeat)
+            results[f"{name}@{duration}s"] = {"seconds": seconds, "rate": len(signal) / seconds, "unit": "samples/s"}
+    return results
+
+
+# Noise reduction of many short voice lines, one call per line against the batched version
+def bench_noise_reduction(l_config, line_numbers, repeat, kernel_filter=None):
+    results = {}
+    sample_rate = l_config.config["Static settings"]["sample_rate"]
+    strength = l_config.config["Advanced Settings"]["noise_reduction"]
+    stationary = l_config.config["Advanced Settings"]["noise_reduction_stationary_thresh"]
+    for line_number in line_numbers:
+        rng = np.random.default_rng(line_number)
+        lines = [generate_audio(rng.uniform(1, 3), sample_rate=sample_rate, seed=i) for i in range(line_number)]
+        samples = sum(len(line) for line in lines)
+        kernels = {
+            "reduce_noise.lines": lambda: [nr.reduce_noise(y=line, sr=sample_rate, prop_decrease=strength,
+                                                           stationary=stationary) for line in lines],
+            "reduce_noise_batch": lambda: reduce_noise_batch(lines, sample_rate, prop_decrease=strength,
+                                                             stationary=stationary),
+        }
+        for name, kernel in kernels.items():
+            if kernel_filter and not any(k in name for k in kernel_filter):
+                continue
+            seconds = time_kernel(kernel, repeat=repeat)
+            results[f"{name}@{line_number}lines"] = {"seconds": seconds, "rate": samples / seconds,
+                                                     "unit": "samples/s"}
+    return results
+
+
+# Encoding of a voice line with each output profile, the size of the written file is reported with the time. The PCM
+# file written in the workspace with workspace_format = wav is timed too
+def bench_encoders(l_config, durations, repeat, kernel_filter=None):
+    results = {}
+    sample_rate = l_config.config["Static settings"]["sample_rate"]
+    audio_format = l_config.config["Static settings"]["audio_format"]
+    with tempfile.TemporaryDirectory() as folder_path:
+        for duration in durations:
+            signal = generate_audio(duration, sample_rate=sample_rate, seed=int(duration * 1000))
+            outputs = {f"encode.{profile}": (f"{folder_path}/line.{audio_format}", settings)
+                       for profile, settings in ENCODER_PROFILES.items()}
+            outputs["encode.workspace.wav"] = (f"{folder_path}/line.wav", None)
+            for name, (file_path, settings) in outputs.items():
+                if kernel_filter and not any(k in name for k in kernel_filter):
+                    continue
+                seconds = time_kernel(lambda: write_audio(file_path, signal, sample_rate, settings=settings),
+                                      repeat=repeat)
+                results[f"{name}@{duration}s"] = {"seconds": seconds, "rate": len(signal) / seconds,
+                                                  "unit": "samples/s", "bytes": os.path.getsize(file_path)}
+    return results
+
+
+def bench_folder_content(l_config, l_log, file_numbers, repeat, kernel_filter=None):
+    results = {}
+    if kernel_filter and not any(k in "get_folder_content" for k in kernel_filter):
+        return results
+    extension = "." + l_config.config["Static settings"]["audio_format"]
+    separator = l_config.config["Static settings"]["name_separator"]
+    for file_number in file_numbers:
+        with tempfile.TemporaryDirectory() as folder_path:
+            for i in range(file_number):
+                open(os.path.join(folder_path, f"Group{i // 20}{separator}{i % 20}{extension}"), "w").close()
+            folder = FileManagement(folder_path, logs=l_log, config=l_config)
+            for raw in (True, False):
+                seconds = time_kernel(lambda: folder.get_folder_content(raw=raw, file_filter=extension),
+                                      repeat=repeat)
+                name = f"get_folder_content.{'raw' if raw else 'grouped'}@{file_number}files"
+                results[name] = {"seconds": seconds, "rate": file_number / seconds, "unit": "files/s"}
+    return results
+
+
+""" -----     BASELINE     ------------------------------------------------------------------------------------------"""
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    return None
+
+
+# Compare the results with the baseline, return the kernels slower than the allowed threshold
+# Differences below min_delta seconds are ignored, they are mostly timer noise on the fastest kernels
+def compare(results, baseline, threshold, min_delta=0.001):
+    regressions = []
+    for name, result in results.items():
+        if name in baseline:
+            ratio = result["seconds"] / baseline[name]["seconds"]
+            if ratio > 1 + threshold and result["seconds"] - baseline[name]["seconds"] > min_delta:
+                regressions.append((name, ratio))
+    return regressions
+
+
+def print_results(results, baseline):
+    print(f"{'kernel':<45}{'time (ms)':>12}{'throughput':>18}{'vs baseline':>14}{'size (KiB)':>12}")
+    for name, result in results.items():
+        change, size = "", ""
+        if name in baseline:
+            change = f"{result['seconds'] / baseline[name]['seconds']:.2f}x"
+        if "bytes" in result:
+            size = f"{result['bytes'] / 1024:.1f}"
+        print(f"{name:<45}{result['seconds'] * 1000:>12.2f}{result['rate']:>12.3g} {result['unit']:<8}{change:>11}"
+              f"{size:>12}")
+    return None
+
+
+""" -----     MAIN     ----------------------------------------------------------------------------------------------"""
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the VoiceLineToolKit DSP kernels (CPU only)")
+    parser.add_argument("--durations", type=float, nargs="+", default=[1, 5, 20],
+                        help="Lengths in seconds of the synthetic tracks")
+    parser.add_argument("--files", type=int, nargs="+", default=[100, 5000],
+                        help="Number of files for the folder listing benchmark")
+    parser.add_argument("--lines", type=int, nargs="+", default=[50],
+                        help="Number of voice lines for the noise reduction benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions per kernel, the fastest one is kept")
+    parser.add_argument("--kernels", nargs="+", default=None, help="Only run the kernels containing these names")
+    parser.add_argument("--baseline", default="benchmark_baseline.json", help="Baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown against the baseline before failing (0.25 = 25%%)")
+    parser.add_argument("--min-delta", type=float, default=1.0,
+                        help="Slowdowns smaller than this many milliseconds are never reported")
+    args = parser.parse_args(args)
+
+    l_log = Logs()
+    l_config = Configuration(logs=l_log)
+    l_config.import_settings()
+
+    results = bench_audio_kernels(l_config, l_log, args.durations, args.repeat, kernel_filter=args.kernels)
+    results.update(bench_encoders(l_config, args.durations, args.repeat, kernel_filter=args.kernels))
+    results.update(bench_noise_reduction(l_config, args.lines, args.repeat, kernel_filter=args.kernels))
+    results.update(bench_folder_content(l_config, l_log, args.files, args.repeat, kernel_filter=args.kernels))
+    baseline = load_baseline(args.baseline)
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        baseline.update(results)
+        save_baseline(args.baseline, baseline)
+        print(f"Baseline saved in {args.baseline}")
+        return 0
+    # Without a baseline nothing is compared, the run must not pass as free of regressions
+    if len(baseline) == 0:
+        print(f"No baseline in {args.baseline}, run with --save-baseline first")
+        return 2
+    regressions = compare(results, baseline, args.threshold, min_delta=args.min_delta / 1000)
+    for name, ratio in regressions:
+        print(f"REGRESSION: {name} is {ratio:.2f}x slower than the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())